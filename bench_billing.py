@@ -0,0 +1,98 @@
+import argparse
+import random
+import time
+from datetime import datetime
+
+from billing_engine import billing_columns, compute_member_bills
+from gym_oop import GymOnTheRock, Member, Session
+
+
+def build_gym(members: int, checkins: int, seed: int = 7) -> GymOnTheRock:
+    rng = random.Random(seed)
+    gym = GymOnTheRock()
+    for n in range(3, 11):
+        gym._store_session(Session(f"S{n:02d}", f"Class {n}", rng.randint(1, 2000), "Both"))
+    session_ids = list(gym.sessions)
+    plan_names = list(gym.membership_plans)
+    for n in range(1, members + 1):
+        gym._store_member(Member(f"M{n:04d}", "Bench", "Member", "555-0100", rng.choice(plan_names), "2026-01-01"))
+    member_ids = list(gym.members)
+    now = datetime.now()
+    for _ in range(checkins):
+        checkin = gym._record_checkin(rng.choice(member_ids), now)
+        for _ in range(rng.randint(0, 2)):
+            checkin.add_session(rng.choice(session_ids))
+    return gym
+
+
+def python_loop_totals(gym: GymOnTheRock) -> dict:
+    # the per-element loop generate_reports used to run, done in one pass over the check-ins; it
+    # discounts each session on its own and adds them up in order, as the ledger and the engine do
+    histories = {mid: [] for mid in gym.members}
+    for checkin in gym.check_ins:
+        if checkin.member_id in histories:
+            histories[checkin.member_id].extend(checkin.sessions)
+    totals = {}
+    for mid, all_sessions in histories.items():
+        plan = gym.membership_plans[gym.members[mid].membership_type]
+        session_cost = 0
+        for sid in all_sessions[plan.included_sessions:]:
+            if sid in gym.sessions:
+                session_cost += gym.sessions[sid].cost * (1 - plan.discount)
+        totals[mid] = plan.cost + session_cost
+    return totals
+
+
+def legacy_loop_seconds(gym: GymOnTheRock, sample: int) -> float:
+    # the old report rescanned every check-in once per member; time a sample and scale it up
+    member_ids = list(gym.members)[:sample]
+    start = time.perf_counter()
+    for mid in member_ids:
+        all_sessions = []
+        for checkin in gym.check_ins:
+            if checkin.member_id == mid:
+                all_sessions.extend(checkin.sessions)
+    return (time.perf_counter() - start) * len(gym.members) / max(len(member_ids), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the python fee loop with the numpy billing engine")
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--checkins", type=int, default=1000000)
+    parser.add_argument("--legacy-sample", type=int, default=5, help="members to time with the old nested scan")
+    args = parser.parse_args()
+
+    print(f"[+]Building {args.members} members and {args.checkins} check-ins...")
+    gym = build_gym(args.members, args.checkins)
+
+    legacy_time = legacy_loop_seconds(gym, args.legacy_sample)
+
+    start = time.perf_counter()
+    loop_totals = python_loop_totals(gym)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = billing_columns(gym)
+    columns_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bills = compute_member_bills(gym, columns)
+    engine_time = time.perf_counter() - start
+
+    # the engine has to match both the ledger and the old loop exactly, to the last bit
+    ledger_mismatches = loop_mismatches = 0
+    for mid, total in zip(bills["member_ids"], bills["total"].tolist()):
+        ledger_mismatches += total != gym.get_member_bill(mid)["total"]
+        loop_mismatches += total != loop_totals[mid]
+
+    print(f"[+]Old nested scan (estimated): {legacy_time:.1f}s")
+    print(f"[+]Single-pass python loop:     {loop_time:.3f}s")
+    print(f"[+]Building billing columns:    {columns_time:.3f}s")
+    print(f"[+]Billing engine on columns:   {engine_time:.3f}s "
+          f"({loop_time / engine_time:.1f}x vs python loop, {legacy_time / engine_time:.0f}x vs nested scan)")
+    print(f"[+]Mismatched totals vs ledger: {ledger_mismatches}")
+    print(f"[+]Mismatched totals vs old loop: {loop_mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+from checkin_store import PartitionedCheckIns
+
+
+class LegacyCheckIn: #the one-object-per-check-in layout gym_oop used before the column store
+    def __init__(self, member_id: str, timestamp: datetime):
+        self.member_id = member_id
+        self.timestamp = timestamp
+        self.sessions = []
+
+
+def sample_checkins(count: int, members: int, seed: int = 7):
+    # ids are built fresh for every row, the way they arrive from input() or a file
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    for n in range(count):
+        sessions = [f"S{rng.randint(1, 10):02d}" for _ in range(rng.randint(0, 2))]
+        yield f"M{rng.randint(1, members):04d}", start + timedelta(seconds=n * 30), sessions
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def build_legacy(count: int, members: int):
+    check_ins = []
+    for member_id, timestamp, sessions in sample_checkins(count, members):
+        checkin = LegacyCheckIn(member_id, timestamp)
+        for sid in sessions:
+            checkin.sessions.append(sid)
+        check_ins.append(checkin)
+    return check_ins
+
+
+def build_store(count: int, members: int):
+    store = PartitionedCheckIns()
+    for member_id, timestamp, sessions in sample_checkins(count, members):
+        index = store.append(member_id, timestamp).index
+        for sid in sessions:
+            store.add_session(index, sid)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per check-in for the old objects and the column store")
+    parser.add_argument("--checkins", type=int, default=1000000)
+    parser.add_argument("--members", type=int, default=9999)
+    args = parser.parse_args()
+
+    legacy = measure(lambda: build_legacy(args.checkins, args.members))
+    store = measure(lambda: build_store(args.checkins, args.members))
+    print(f"[+]{args.checkins} check-ins for {args.members} members")
+    print(f"[+]CheckIn objects: {legacy / args.checkins:.1f} bytes per check-in ({legacy / 2 ** 20:.1f} MiB)")
+    print(f"[+]Column store:    {store / args.checkins:.1f} bytes per check-in ({store / 2 ** 20:.1f} MiB)")
+    print(f"[+]{legacy / store:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Callable, Iterator, List
+
+from datagen import SCALES, generate_gym
+from gym_oop import GymOnTheRock, User, hash_password
+from reports import ReportSink
+
+# Times the hot paths of GymOnTheRock on a synthetic gym and writes the results as json,
+# so runs from different releases can be compared. The menu functions are driven through
+# a scripted input() with their printing sent to /dev/null.
+
+
+class CountingSink(ReportSink): #takes every report row and only counts it, so the report itself is timed
+    def __init__(self):
+        self.rows = 0
+
+    def write_row(self, section, row):
+        self.rows += 1
+
+
+@contextlib.contextmanager
+def scripted_input(answers: Iterator[str]):
+    # answers the menu prompts from an iterator instead of the keyboard and hides what they print
+    real_input = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        builtins.input = real_input
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timed(name: str, iterations: int, action: Callable[[int], object]) -> dict:
+    times = []
+    for n in range(iterations):
+        start = time.perf_counter()
+        action(n)
+        times.append(time.perf_counter() - start)
+    total = sum(times)
+    times.sort()
+    return {"name": name, "iterations": iterations, "total_s": round(total, 6),
+            "mean_ms": round(total / iterations * 1000, 4), "p50_ms": round(percentile(times, 50) * 1000, 4),
+            "p99_ms": round(percentile(times, 99) * 1000, 4)}
+
+
+def run_benchmarks(gym: GymOnTheRock, iterations: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    member_ids = list(gym.members)
+    session_ids = list(gym.sessions)
+    members = list(gym.members.values())
+    gym._store_user(User("bench", hash_password("bench-password")))
+    results = []
+
+    # reports: the whole report into a counting sink, and the console version the menu prints
+    results.append(timed("generate_reports", max(1, iterations // 100),
+                         lambda n: gym.generate_reports([CountingSink()])))
+    with scripted_input(iter(())):
+        results.append(timed("generate_reports_console", max(1, iterations // 100),
+                             lambda n: gym.generate_reports()))
+
+    # check-in at the kiosk: id, two sessions, then F to finish
+    answers = (answer for _ in iter(int, 1) for answer in
+               (rng.choice(member_ids), rng.choice(session_ids), rng.choice(session_ids), "F"))
+    with scripted_input(answers):
+        results.append(timed("member_checkin", iterations, lambda n: gym.member_checkin()))
+
+    # login goes through scrypt, so it gets far fewer rounds than the rest
+    answers = (answer for _ in iter(int, 1) for answer in ("bench", "bench-password"))
+    with scripted_input(answers):
+        results.append(timed("login", max(1, iterations // 200), lambda n: gym.login()))
+
+    # lookups the menu and front desk make
+    queries = [rng.choice((m.first_name[:3], m.last_name, m.member_id[:3], m.contact[:7])) for m in members[:1000]]
+    results.append(timed("find_members", iterations, lambda n: gym.find_members(queries[n % len(queries)])))
+    results.append(timed("member_for_user", iterations,
+                         lambda n: gym.member_index.member_for_user(members[n % len(members)].first_name)))
+    results.append(timed("get_member_bill", iterations,
+                         lambda n: gym.get_member_bill(members[n % len(members)].member_id)))
+
+    # id generation, on its own and as part of adding a member through the menu
+    results.append(timed("generate_member_id", iterations, lambda n: gym.generate_member_id()))
+    results.append(timed("allocate_member_ids_100", max(1, iterations // 10), lambda n: gym.allocate_member_ids(100)))
+    answers = (answer for _ in iter(int, 1) for answer in ("Bench", "Member", "876-555-0100", "Gold", "Y", ""))
+    with scripted_input(answers):
+        results.append(timed("add_member", iterations, lambda n: gym.add_member()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gym-On-The-Rock on a synthetic gym")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k", help="number of check-ins")
+    parser.add_argument("--iterations", type=int, default=1000, help="rounds for the fast operations")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gym = generate_gym(SCALES[args.scale], seed=args.seed)
+    generate_time = time.perf_counter() - start
+    members, checkins = len(gym.members), len(gym.check_ins)
+
+    results = run_benchmarks(gym, args.iterations, args.seed)
+    gym.close()
+
+    report = {"scale": args.scale, "members": members, "checkins": checkins,
+              "generate_s": round(generate_time, 3), "python": platform.python_version(),
+              "platform": platform.platform(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+              "results": results}
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"[+]{args.scale}: {members} members, {checkins} check-ins (generated in {generate_time:.1f}s)")
+    for result in results:
+        print(f"[+]{result['name']:<26} {result['iterations']:>6} runs  mean {result['mean_ms']:.3f}ms  "
+              f"p99 {result['p99_ms']:.3f}ms")
+    print(f"[+]Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
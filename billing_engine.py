@@ -0,0 +1,108 @@
+from typing import Optional
+
+import numpy as np
+
+from checkin_store import CheckInStore, current_period
+from gym_oop import GymOnTheRock
+
+
+def registration_arrays(store: CheckInStore, member_index: dict, session_index: dict):
+    # one month's registration columns: who registered, for which session and when, in order
+    # cut where they are now, registrations first so every one kept points at a check-in row that is kept
+    # too; the slices are copies, a buffer over the live arrays would stop check-ins from growing them
+    registration_count = len(store.registration_session)
+    checkin_count = len(store.members)
+    registration_checkin = store.registration_checkin[:registration_count]
+    registration_session = store.registration_session[:registration_count]
+    checkin_member_codes = store.members[:checkin_count]
+    checkin_timestamps = store.timestamps[:checkin_count]
+
+    unknown = len(session_index)  # sessions that no longer exist are counted but cost nothing
+    # translate the store's interned codes into this report's member and session positions
+    member_of_code = np.array([member_index.get(mid, -1) for mid in store.member_ids[:]] + [-1], dtype=np.int64)
+    session_of_code = np.array([session_index.get(sid, unknown) for sid in store.session_ids[:]] + [unknown],
+                               dtype=np.int64)
+
+    checkin_rows = np.frombuffer(registration_checkin, dtype=np.int32)
+    checkin_members = np.frombuffer(checkin_member_codes, dtype=np.int32)
+    members = member_of_code[checkin_members[checkin_rows]]
+    sessions = session_of_code[np.frombuffer(registration_session, dtype=np.int32)]
+    timestamps = np.frombuffer(checkin_timestamps, dtype=np.float64)[checkin_rows]
+    known = members >= 0  # check-ins for members that are not on file are ignored
+    return members[known], sessions[known], timestamps[known]
+
+
+def billing_columns(gym: GymOnTheRock, period: Optional[str] = None) -> dict:
+    # the column form of one month's check-ins (this month by default); build it once and reuse it.
+    # Read from a point-in-time view, so members, plans and prices all agree with the rows cut
+    with gym.read_view() as view:
+        members_now = list(view.members.values())
+        member_ids = [member.member_id for member in members_now]
+        plans = [view.membership_plans[member.membership_type] for member in members_now]
+        session_ids = list(view.sessions)
+        prices = {sid: (list(times), list(costs)) for sid, (times, costs) in gym.earnings.prices.items()}
+        store = gym.check_ins.read(period or current_period()) or CheckInStore()
+        members, sessions, timestamps = registration_arrays(
+            store,
+            {mid: i for i, mid in enumerate(member_ids)},
+            {sid: i for i, sid in enumerate(session_ids)},
+        )
+    return {"member_ids": member_ids, "plans": plans, "session_ids": session_ids, "prices": prices,
+            "members": members, "sessions": sessions, "timestamps": timestamps}
+
+
+def registration_prices(price_history: dict, session_ids: list, sessions: np.ndarray,
+                        timestamps: np.ndarray) -> np.ndarray:
+    # each registration at the session's price when it happened, the same lookup SessionEarnings.price_at does
+    prices = np.zeros(len(sessions), dtype=np.int64)  # sessions that no longer exist stay at 0
+    for position, sid in enumerate(session_ids):
+        history = price_history.get(sid)
+        if history is None:
+            continue
+        times, costs = history
+        mask = sessions == position
+        if len(costs) == 1:
+            prices[mask] = costs[0]
+        else:
+            change = np.searchsorted(np.array(times), timestamps[mask], side="right") - 1
+            prices[mask] = np.array(costs, dtype=np.int64)[np.maximum(change, 0)]
+    return prices
+
+
+def compute_member_bills(gym: GymOnTheRock, columns: Optional[dict] = None, period: Optional[str] = None) -> dict:
+    # same numbers as GymOnTheRock.get_member_bill, for every member in one batched pass
+    if columns is None:
+        columns = billing_columns(gym, period)
+    member_ids = columns["member_ids"]
+    session_ids = columns["session_ids"]
+    members = columns["members"]
+    sessions = columns["sessions"]
+
+    plans = columns["plans"]
+    membership_cost = np.array([plan.cost for plan in plans], dtype=np.int64)
+    included = np.array([plan.included_sessions for plan in plans], dtype=np.int64)
+    # 1 - discount is worked out in python so the float matches the ledger bit for bit
+    discount_factor = np.array([1 - plan.discount for plan in plans], dtype=np.float64)
+    session_price = registration_prices(columns["prices"], session_ids, sessions, columns["timestamps"])
+    count = len(member_ids)
+    session_count = np.bincount(members, minlength=count)
+
+    # position of each registration within its member's history, in check-in order
+    order = np.argsort(members, kind="stable")
+    starts = np.cumsum(session_count) - session_count
+    rank = np.empty_like(members)
+    rank[order] = np.arange(len(members)) - starts[members[order]]
+
+    # only sessions past the plan allowance are charged, each one less the discount; bincount adds them up
+    # in registration order, the same float additions the ledger makes, so the totals match it bit for bit
+    paid = rank >= included[members]
+    charged = session_price[paid] * discount_factor[members[paid]]
+    session_cost = np.bincount(members[paid], weights=charged, minlength=count)
+
+    return {
+        "member_ids": member_ids,
+        "membership_cost": membership_cost,
+        "sessions": session_count,
+        "session_cost": session_cost,
+        "total": membership_cost + session_cost,
+    }
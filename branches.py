@@ -0,0 +1,210 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from checkin_store import current_period
+from gym_oop import GymOnTheRock
+from reports import CsvSink, JsonLinesSink, ReportSink
+from storage import open_storage
+
+# Month-end billing across every location. Each branch is its own GymOnTheRock (its own
+# storage) and is loaded and aggregated in a worker process of its own; the partial sums are
+# merged at the end. A branch isn't split further: loading it from storage is nearly all the
+# work, and every piece would have to load the whole branch again just to add up its share.
+# Everything that gets added up is a whole number of dollars or a count, and plan discounts
+# are applied once per plan after merging, so the totals don't depend on how the work is spread.
+
+# gyms a worker has loaded (or inherited from the parent when it forks), by branch name
+_gyms: Dict[str, GymOnTheRock] = {}
+_locations: Dict[str, str] = {}
+
+
+def _init_worker(locations: Dict[str, str]):
+    _locations.update(locations)
+
+
+def _branch_gym(branch: str) -> GymOnTheRock:
+    gym = _gyms.get(branch)
+    if gym is None:
+        # read-only, without the writer's lock, so a branch can be billed while it is still open
+        gym = _gyms[branch] = GymOnTheRock(open_storage(_locations[branch], read_only=True))
+    return gym
+
+
+def branch_aggregate(gym: GymOnTheRock, period: str) -> dict:
+    # the membership and class-earnings sums generate_reports makes, for one branch;
+    # read through a point-in-time view, so a branch that is still taking check-ins can be billed
+    with gym.read_view() as view:
+        plans = {name: [0, 0, 0, 0] for name in view.membership_plans}  # members, membership fees, sessions, paid $
+        membership_plans = view.membership_plans
+        for mid, member in view.members.items():
+            totals = plans[member.membership_type]
+            totals[0] += 1
+            totals[1] += membership_plans[member.membership_type].cost
+            bill = view.bill(mid, period)
+            if bill is not None:
+                totals[2] += bill.session_count
+                totals[3] += bill.paid_cost
+        classes = {}
+        earnings = view.session_totals(period)
+        for sid, session in view.sessions.items():
+            registrations, earned = earnings.get(sid, (0, 0))
+            totals = classes.setdefault(session.name, [0, 0])
+            totals[0] += registrations
+            totals[1] += earned
+    discounts = {name: plan.discount for name, plan in membership_plans.items()}
+    return {"plans": plans, "classes": classes, "discounts": discounts}
+
+
+def _aggregate_task(task: Tuple[str, str]) -> Tuple[str, dict]:
+    branch, period = task
+    return branch, branch_aggregate(_branch_gym(branch), period)
+
+
+def _add(into: Dict[str, list], partial: Dict[str, list]):
+    for key, values in partial.items():
+        totals = into.setdefault(key, [0] * len(values))
+        for i, value in enumerate(values):
+            totals[i] += value
+
+
+def merge(partials: List[Tuple[str, dict]]) -> dict:
+    # partial sums from every branch -> one report; all whole numbers until the discounts at the end
+    branches, plans, classes, discounts = {}, {}, {}, {}
+    for branch, partial in partials:
+        _add(branches.setdefault(branch, {}), partial["plans"])
+        _add(plans, partial["plans"])
+        _add(classes, partial["classes"])
+        discounts.update(partial["discounts"])
+
+    def fees(plan_totals: Dict[str, list]) -> dict:
+        rows = {}
+        for name, (members, membership_fees, sessions, paid) in plan_totals.items():
+            session_fees = paid * (1 - discounts[name]) if paid else 0
+            rows[name] = {"members": members, "membership_fees": membership_fees, "sessions": sessions,
+                          "session_fees": session_fees, "total": membership_fees + session_fees}
+        return rows
+
+    return {
+        "memberships": fees(plans),
+        "branches": {branch: fees(branch_plans) for branch, branch_plans in branches.items()},
+        "class_earnings": {name: {"registrations": registrations, "total_earnings": earned}
+                           for name, (registrations, earned) in classes.items()},
+    }
+
+
+def consolidate(branches: Dict[str, object], period: Optional[str] = None, workers: Optional[int] = None) -> dict:
+    # branches maps a branch name to its storage location, or to a GymOnTheRock that's already loaded.
+    # workers=0 runs everything in this process, which is also the reference the parallel run must match
+    period = period or current_period()
+    tasks = [(branch, period) for branch in branches]
+    loaded = {branch: gym for branch, gym in branches.items() if isinstance(gym, GymOnTheRock)}
+    locations = {branch: location for branch, location in branches.items() if branch not in loaded}
+
+    _gyms.update(loaded)
+    try:
+        if workers == 0:
+            _init_worker(locations)
+            return merge([_aggregate_task(task) for task in tasks])
+        # loaded gyms reach the workers through fork; the others are loaded by whichever worker needs them
+        context = multiprocessing.get_context("fork") if loaded else None
+        workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))  # more than one per branch would sit idle
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(locations,)) as pool:
+            return merge(list(pool.map(_aggregate_task, tasks)))
+    finally:
+        for branch in branches:
+            gym = _gyms.pop(branch, None)
+            if branch in locations and gym is not None:
+                gym.storage.close()  # only read from, so no snapshot on the way out
+
+
+def report_rows(report: dict):
+    # the consolidated report as (section, row) pairs for the usual report sinks
+    for name, row in report["memberships"].items():
+        yield "memberships", {"membership_type": name, **row}
+    for branch, plans in report["branches"].items():
+        for name, row in plans.items():
+            yield "branch_memberships", {"branch": branch, "membership_type": name, **row}
+    for name, row in report["class_earnings"].items():
+        yield "class_earnings", {"class": name, **row}
+
+
+CONSOLIDATED_SECTIONS = [  # (section, the fields of its rows), in the order report_rows yields them
+    ("memberships", ["membership_type", "members", "membership_fees", "sessions", "session_fees", "total"]),
+    ("branch_memberships", ["branch", "membership_type", "members", "membership_fees", "sessions", "session_fees",
+                            "total"]),
+    ("class_earnings", ["class", "registrations", "total_earnings"]),
+]
+
+
+def write_consolidated(report: dict, sinks: List[ReportSink]):
+    rows = report_rows(report)
+    pending = next(rows, None)
+    for section, fields in CONSOLIDATED_SECTIONS:
+        for sink in sinks:
+            sink.start_section(section, fields)
+        while pending is not None and pending[0] == section:
+            for sink in sinks:
+                sink.write_row(section, pending[1])
+            pending = next(rows, None)
+        for sink in sinks:
+            sink.end_section(section)
+    for sink in sinks:
+        sink.close()
+
+
+def print_report(report: dict, period: str):
+    print(f"[+]Consolidated billing for {period} across {len(report['branches'])} branches")
+    print("\n[+]List of members for each membership type and total fees:")
+    for name, row in report["memberships"].items():
+        print(f"[+]{name}: {row['members']} members, Total fees: ${row['membership_fees']}, "
+              f"Sessions: {row['sessions']} (${row['session_fees']:.2f}), Total: ${row['total']:.2f}")
+    print("\n[+]Totals for each branch:")
+    for branch, plans in report["branches"].items():
+        members = sum(row["members"] for row in plans.values())
+        total = sum(row["total"] for row in plans.values())
+        print(f"[+]{branch}: {members} members, Total monthly fees: ${total:.2f}")
+    print("\n[+]List of classes && total earnings:")
+    for name, row in report["class_earnings"].items():
+        print(f"[+]{name}: {row['registrations']} registrations, Total earnings: ${row['total_earnings']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidated month-end billing across Gym-On-The-Rock branches")
+    parser.add_argument("--branch", action="append", required=True, metavar="NAME=LOCATION",
+                        help="a branch and its storage location; repeat for each branch")
+    parser.add_argument("--period", help="billing month YYYY-MM (default: this month)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per cpu, 0 runs in-process)")
+    parser.add_argument("--csv", help="also write each section as csv into this directory")
+    parser.add_argument("--jsonl", action="store_true", help="write json lines to stdout instead of the summary")
+    args = parser.parse_args()
+
+    branches = {}
+    for spec in args.branch:
+        name, sep, location = spec.partition("=")
+        if not sep or not name or not location:
+            parser.error(f"Error 2003: --branch takes NAME=LOCATION, got {spec!r}")
+        branches[name] = location
+
+    period = args.period or current_period()
+    start = time.perf_counter()
+    report = consolidate(branches, period, args.workers)
+    elapsed = time.perf_counter() - start
+
+    sinks = [CsvSink(args.csv)] if args.csv else []
+    if args.jsonl:
+        sinks.append(JsonLinesSink(sys.stdout))
+    else:
+        print_report(report, period)
+        print(f"\n[+]Aggregated {len(branches)} branches in {elapsed:.2f}s")
+    if sinks:
+        write_consolidated(report, sinks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+import json
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Check-ins are kept column by column in typed arrays instead of one object each, split into
+# one partition per calendar month ("2026-10") so billing and range queries only touch the
+# months they ask about.
+#
+# Inside a partition (CheckInStore):
+#   check-in rows:     member code, epoch timestamp, first/last registration row, global index
+#   registration rows: check-in row, session code, next registration of the same check-in
+# Member and session ids are interned once and stored as integer codes. Registrations are one
+# flat column in the order they happened; each check-in's own sessions are chained through
+# next_registration, so a session can be added to any check-in, not just the newest one.
+#
+# PartitionedCheckIns numbers check-ins globally in arrival order (the index the gym, the log
+# and the front desk service use) and maps each index to its partition and local row.
+
+
+@lru_cache(maxsize=8192)
+def _period_of_quarter_hour(quarter: int) -> str:
+    return datetime.fromtimestamp(quarter * 900).strftime("%Y-%m")
+
+
+def period_of(timestamp: float) -> str: #the billing period (calendar month) a timestamp falls in
+    # every utc offset is a whole number of quarter hours, so the month is the same all through one
+    return _period_of_quarter_hour(int(timestamp // 900))
+
+
+def _month_end(period: str) -> float: #first timestamp of the month after a period
+    year, month = int(period[:4]), int(period[5:7])
+    return datetime(year + month // 12, month % 12 + 1, 1).timestamp()
+
+
+def period_bounds(period: str) -> Tuple[float, float]: #first timestamp of a month and of the month after it
+    return datetime(int(period[:4]), int(period[5:7]), 1).timestamp(), _month_end(period)
+
+
+def current_period() -> str:
+    return datetime.now().strftime("%Y-%m")
+
+
+class CheckIn: #information you would need when you check in at the front desk, read from the store
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index: int):
+        self.store = store
+        self.index = index  # position in the gym's check-in list
+
+    @property
+    def member_id(self) -> str:
+        return self.store.member_of(self.index)
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.store.timestamp_of(self.index))
+
+    @property
+    def period(self) -> str:
+        return period_of(self.store.timestamp_of(self.index))
+
+    @property
+    def sessions(self) -> List[str]:
+        return self.store.sessions_of(self.index)
+
+    def add_session(self, session_id: str):
+        self.store.add_session(self.index, session_id)
+
+
+class CheckInStore: #the columns for one partition, or for everything if used on its own
+    def __init__(self, on_session: Optional[Callable[[CheckIn, str], None]] = None):
+        self.on_session = on_session  # called before a registration is stored
+        self.member_ids = []  # member code -> member id
+        self.member_codes = {}  # member id -> member code
+        self.session_ids = []  # session code -> session id
+        self.session_codes = {}  # session id -> session code
+
+        self.members = array("i")  # member code of each check-in
+        self.timestamps = array("d")  # seconds since the epoch
+        self.first_registration = array("i")  # -1 when the check-in has no sessions yet
+        self.last_registration = array("i")
+        self.global_index = array("i")  # position in PartitionedCheckIns, same as the row when standalone
+
+        self.registration_checkin = array("i")
+        self.registration_session = array("i")
+        self.next_registration = array("i")  # -1 ends the chain
+
+        self.in_order = True  # rows arrived in time order, so the timestamps column is sorted as it is
+        self.time_order = None  # otherwise: rows sorted by timestamp, worked out again on the next query after a change
+        self.member_registrations = None  # member code -> its registration rows, built on the first member_sessions
+
+    def _intern(self, value: str, codes: Dict[str, int], values: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _intern_all(self, new_values: List[str], codes: Dict[str, int], values: List[str]) -> array:
+        for value in dict.fromkeys(new_values):  # each new value once, in the order first seen
+            if value not in codes:
+                codes[value] = len(values)
+                values.append(value)
+        return array("i", map(codes.__getitem__, new_values))
+
+    def append(self, member_id: str, timestamp: datetime, global_index: Optional[int] = None) -> CheckIn:
+        seconds = timestamp.timestamp()
+        row = len(self.members)
+        if self.timestamps and seconds < self.timestamps[-1]:
+            self.in_order = False  # e.g. an import of older door logs
+        self.members.append(self._intern(member_id, self.member_codes, self.member_ids))
+        self.timestamps.append(seconds)
+        self.first_registration.append(-1)
+        self.last_registration.append(-1)
+        self.global_index.append(row if global_index is None else global_index)
+        self.time_order = None
+        return CheckIn(self, row)
+
+    def add_session(self, index: int, session_id: str):
+        if self.on_session is not None: #lets the gym update the member's bill and save the registration
+            self.on_session(CheckIn(self, index), session_id)
+        row = len(self.registration_session)
+        self.registration_checkin.append(index)
+        self.registration_session.append(self._intern(session_id, self.session_codes, self.session_ids))
+        self.next_registration.append(-1)
+        if self.member_registrations is not None:
+            self.member_registrations.setdefault(self.members[index], []).append(row)
+        if self.last_registration[index] == -1:
+            self.first_registration[index] = row
+        else:
+            self.next_registration[self.last_registration[index]] = row
+        self.last_registration[index] = row
+
+    def extend(self, member_ids: List[str], timestamps: List[float],
+               registration_checkins: List[int], registration_sessions: List[str],
+               global_indexes: Optional[List[int]] = None):
+        # bulk load of whole columns, e.g. from a snapshot; on_session is not called
+        start = len(self.members)
+        in_order = all(earlier <= later for earlier, later in zip(timestamps, timestamps[1:]))
+        if self.timestamps and timestamps and timestamps[0] < self.timestamps[-1]:
+            in_order = False
+        self.members.extend(self._intern_all(member_ids, self.member_codes, self.member_ids))
+        self.timestamps.extend(timestamps)
+        self.first_registration.extend([-1] * len(member_ids))
+        self.last_registration.extend([-1] * len(member_ids))
+        self.global_index.extend(range(start, start + len(member_ids)) if global_indexes is None else global_indexes)
+        self.in_order = self.in_order and in_order
+        self.time_order = None
+        self.member_registrations = None
+
+        first, last, next_registration = self.first_registration, self.last_registration, self.next_registration
+        row = len(self.registration_session)
+        self.registration_checkin.extend(start + index for index in registration_checkins)
+        self.registration_session.extend(self._intern_all(registration_sessions, self.session_codes, self.session_ids))
+        next_registration.extend([-1] * len(registration_checkins))
+        for index in self.registration_checkin[row:]:
+            if last[index] == -1:
+                first[index] = row
+            else:
+                next_registration[last[index]] = row
+            last[index] = row
+            row += 1
+
+    def member_of(self, index: int) -> str:
+        return self.member_ids[self.members[index]]
+
+    def timestamp_of(self, index: int) -> float:
+        return self.timestamps[index]
+
+    def sessions_of(self, index: int) -> List[str]:
+        sessions = []
+        row = self.first_registration[index]
+        while row != -1:
+            sessions.append(self.session_ids[self.registration_session[row]])
+            row = self.next_registration[row]
+        return sessions
+
+    def rows_in_time_order(self) -> Sequence[int]:
+        if self.in_order:
+            return range(len(self.members))
+        if self.time_order is None:  # sorted once for all the appends since the last query
+            self.time_order = array("i", sorted(range(len(self.timestamps)), key=self.timestamps.__getitem__))
+        return self.time_order
+
+    def rows_between(self, start: float, end: float) -> List[int]: #rows with start <= timestamp < end, oldest first
+        if self.in_order:
+            return list(range(bisect_left(self.timestamps, start), bisect_left(self.timestamps, end)))
+        time_order = self.rows_in_time_order()
+        key = self.timestamps.__getitem__
+        return list(time_order[bisect_left(time_order, start, key=key):bisect_left(time_order, end, key=key)])
+
+    def registrations(self) -> Iterator[Tuple[str, str]]: #(member id, session id) for every registration, in order
+        member_ids, session_ids, members = self.member_ids, self.session_ids, self.members
+        for checkin, session in zip(self.registration_checkin, self.registration_session):
+            yield member_ids[members[checkin]], session_ids[session]
+
+    def session_counts(self) -> Counter: #session id -> number of registrations
+        counts = Counter(self.registration_session)
+        return Counter({self.session_ids[code]: count for code, count in counts.items()})
+
+    def member_sessions(self, member_id: str) -> List[str]: #every session one member has registered for
+        code = self.member_codes.get(member_id)
+        if code is None:
+            return []
+        if self.member_registrations is None:  # one pass over the registrations, then kept up to date by add_session
+            self.member_registrations = {}
+            members = self.members
+            for row, checkin in enumerate(self.registration_checkin):
+                self.member_registrations.setdefault(members[checkin], []).append(row)
+        session_ids, registration_session = self.session_ids, self.registration_session
+        return [session_ids[registration_session[row]] for row in self.member_registrations.get(code, ())]
+
+    def to_columns(self) -> dict:
+        return {
+            "member_id": [self.member_ids[code] for code in self.members],
+            "timestamp": self.timestamps.tolist(),
+            "global_index": self.global_index.tolist(),
+            "registration_checkin": self.registration_checkin.tolist(),
+            "registration_session": [self.session_ids[code] for code in self.registration_session],
+        }
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __getitem__(self, index: int) -> CheckIn:
+        if index < 0:
+            index += len(self.members)
+        if not 0 <= index < len(self.members):
+            raise IndexError("check-in index out of range")
+        return CheckIn(self, index)
+
+    def __iter__(self) -> Iterator[CheckIn]:
+        for index in range(len(self.members)):
+            yield CheckIn(self, index)
+
+
+class PartitionedCheckIns: #every check-in, one CheckInStore per month
+    def __init__(self, on_session: Optional[Callable[[CheckIn, str], None]] = None):
+        self.on_session = on_session  # called with the global CheckIn before a registration is stored
+        self.partitions = {}  # "YYYY-MM" -> CheckInStore, in the order they were first used
+        self.period_names = []  # partition number -> "YYYY-MM"
+        self.period_numbers = {}  # "YYYY-MM" -> partition number
+        self.archived = {}  # "YYYY-MM" -> file holding a partition that was moved out of memory
+        self.peeked = None  # (period, store) of the last archived month read without loading it back
+        self.row_partition = array("i")  # global index -> partition number
+        self.row_local = array("i")  # global index -> row inside that partition
+        self.gaps = 0  # positions a restore left free between archived months, see restore_archived
+
+    def _locate(self, index: int, load: bool = False) -> Tuple[CheckInStore, int]:
+        # reads only peek at an archived month; a change (load=True) brings it back for good
+        period = self.period_names[self.row_partition[index]]
+        return self.partition(period) if load else self.read(period), self.row_local[index]
+
+    def partition(self, period: str, create: bool = False) -> Optional[CheckInStore]:
+        store = self.partitions.get(period)
+        if store is None and period in self.archived:
+            store = self._load_archive(period)
+        if store is None and create:
+            store = self.partitions[period] = CheckInStore()
+            self.period_numbers[period] = len(self.period_names)
+            self.period_names.append(period)
+        return store
+
+    def periods(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]: #sorted, both ends inclusive
+        return sorted(p for p in self.period_names if (start is None or p >= start) and (end is None or p <= end))
+
+    def append(self, member_id: str, timestamp: datetime) -> CheckIn:
+        period = timestamp.strftime("%Y-%m")
+        store = self.partition(period, create=True)
+        if self.gaps:
+            raise ValueError("check-ins from before the archived months haven't been restored yet")
+        index = len(self.row_partition)
+        self.row_partition.append(self.period_numbers[period])
+        self.row_local.append(store.append(member_id, timestamp, index).index)
+        return CheckIn(self, index)
+
+    def add_session(self, index: int, session_id: str):
+        if self.on_session is not None: #lets the gym update the member's bill and save the registration
+            self.on_session(CheckIn(self, index), session_id)
+        store, row = self._locate(index, load=True)
+        store.add_session(row, session_id)
+
+    def extend(self, member_ids: List[str], timestamps: List[float],
+               registration_checkins: List[int], registration_sessions: List[str]):
+        # bulk load of whole columns (global positions), split up by month; on_session is not called.
+        # After restore_archived the rows fill the positions the archived months left free, in order
+        count = len(member_ids)
+        positions = self._free_positions(count)
+        in_order = all(earlier <= later for earlier, later in zip(timestamps, timestamps[1:]))
+        periods = None if in_order else [period_of(timestamp) for timestamp in timestamps]
+        groups = {}  # period -> the slices of these columns that belong to it
+        runs = []  # (group, first row, end row, local row of the first) for each stretch of rows from one month
+        start = 0
+        while start < count:
+            if in_order:  # the usual case: a month's rows end where the next month starts
+                period = period_of(timestamps[start])
+                row = bisect_left(timestamps, _month_end(period), start)
+            else:
+                period = periods[start]
+                row = start + 1
+                while row < count and periods[row] == period:
+                    row += 1
+            group = groups.get(period)
+            if group is None:
+                store = self.partition(period, create=True)
+                group = groups[period] = {"period": period, "store": store, "rows": len(store),
+                                          "member_ids": [], "timestamps": [],
+                                          "indexes": [], "registration_rows": [], "registration_sessions": []}
+            runs.append((group, start, row, group["rows"]))
+            group["rows"] += row - start
+            group["member_ids"] += member_ids[start:row]
+            group["timestamps"] += timestamps[start:row]
+            group["indexes"] += positions[start:row]
+            start = row
+
+        # rows are mostly in time order, so this is a handful of runs, each written as a whole
+        for group, start, end, local in runs:
+            number = self.period_numbers[group["period"]]
+            if isinstance(positions, range):
+                self.row_partition.extend([number] * (end - start))
+                self.row_local.extend(range(local, local + end - start))
+                continue
+            for position, row in zip(positions[start:end], range(local, local + end - start)):
+                if position < len(self.row_partition):
+                    self.row_partition[position] = number
+                    self.row_local[position] = row
+                else:
+                    self.row_partition.append(number)
+                    self.row_local.append(row)
+
+        if all(earlier <= later for earlier, later in zip(registration_checkins, registration_checkins[1:])):
+            # registrations of the check-ins in each run are a slice of their own
+            for group, start, end, local in runs:
+                low, high = bisect_left(registration_checkins, start), bisect_left(registration_checkins, end)
+                offset = local - start - len(group["store"])  # registration rows count from the rows loaded here
+                group["registration_rows"] += [checkin + offset for checkin in registration_checkins[low:high]]
+                group["registration_sessions"] += registration_sessions[low:high]
+        else:
+            group_of = []  # each row's group, and its position among the rows that group loads
+            loaded = array("i")
+            for group, start, end, local in runs:
+                first = local - len(group["store"])
+                group_of += [group] * (end - start)
+                loaded.extend(range(first, first + end - start))
+            for checkin, session_id in zip(registration_checkins, registration_sessions):
+                group = group_of[checkin]
+                group["registration_rows"].append(loaded[checkin])
+                group["registration_sessions"].append(session_id)
+        for group in groups.values():
+            group["store"].extend(group["member_ids"], group["timestamps"], group["registration_rows"],
+                                  group["registration_sessions"], group["indexes"])
+
+    def member_of(self, index: int) -> str:
+        store, row = self._locate(index)
+        return store.member_of(row)
+
+    def timestamp_of(self, index: int) -> float:
+        store, row = self._locate(index)
+        return store.timestamp_of(row)
+
+    def sessions_of(self, index: int) -> List[str]:
+        store, row = self._locate(index)
+        return store.sessions_of(row)
+
+    def between(self, start: datetime, end: datetime, member_id: Optional[str] = None) -> List[CheckIn]:
+        # check-ins with start <= timestamp < end; months outside the range are never looked at
+        start_seconds, end_seconds = start.timestamp(), end.timestamp()
+        found = []
+        for period in self.periods(start.strftime("%Y-%m"), end.strftime("%Y-%m")):
+            store = self.read(period)
+            code = store.member_codes.get(member_id) if member_id is not None else None
+            if member_id is not None and code is None:
+                continue
+            for row in store.rows_between(start_seconds, end_seconds):
+                if code is None or store.members[row] == code:
+                    found.append(CheckIn(self, store.global_index[row]))
+        return found
+
+    def in_period(self, period: str, member_id: Optional[str] = None) -> List[CheckIn]: #a whole billing period
+        store = self.read(period)
+        if store is None:
+            return []
+        code = store.member_codes.get(member_id) if member_id is not None else None
+        if member_id is not None and code is None:
+            return []
+        return [CheckIn(self, store.global_index[row]) for row in store.rows_in_time_order()
+                if code is None or store.members[row] == code]
+
+    def registrations(self, period: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        # (member id, session id) in the order they were made, month by month
+        for name in ([period] if period is not None else self.periods()):
+            store = self.read(name)
+            if store is not None:
+                yield from store.registrations()
+
+    def session_counts(self, period: Optional[str] = None) -> Counter: #session id -> registrations
+        counts = Counter()
+        for name in ([period] if period is not None else self.periods()):
+            store = self.read(name)
+            if store is not None:
+                counts.update(store.session_counts())
+        return counts
+
+    def member_sessions(self, member_id: str, archived: bool = True) -> List[str]:
+        # archived=False leaves out the months on disk, e.g. for something redrawn as often as the menu
+        sessions = []
+        for period in self.periods():
+            if archived or period in self.partitions:
+                sessions.extend(self.read(period).member_sessions(member_id))
+        return sessions
+
+    def archive(self, period: str, directory: str) -> str:
+        # writes a closed month to disk and drops its columns; it is read back in if anything asks for it
+        if period >= current_period():
+            raise ValueError(f"{period} is still open and can't be archived")
+        store = self.partitions.get(period)
+        if store is None:
+            raise KeyError(period)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"checkins-{period}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(store.to_columns(), f, separators=(",", ":"))
+        self.archived[period] = path
+        del self.partitions[period]
+        return path
+
+    def restore_archived(self, period: str, path: str, runs: List[List[int]]):
+        # an archived month from a snapshot: its global positions ([start, count] runs) are taken
+        # again but its rows stay on disk. Goes before extend(), which fills the positions left free
+        number = self.period_numbers[period] = len(self.period_names)
+        self.period_names.append(period)
+        self.archived[period] = path
+        row = 0
+        for start, count in runs:
+            missing = start + count - len(self.row_partition)
+            if missing > 0:
+                self.row_partition.extend([-1] * missing)
+                self.row_local.extend([-1] * missing)
+                self.gaps += missing
+            for position in range(start, start + count):
+                if self.row_partition[position] == -1:
+                    self.gaps -= 1
+                self.row_partition[position] = number
+                self.row_local[position] = row
+                row += 1
+
+    def _free_positions(self, count: int) -> Iterable[int]:
+        if not self.gaps:
+            start = len(self.row_partition)
+            return range(start, start + count)
+        positions = [position for position, number in enumerate(self.row_partition) if number == -1][:count]
+        self.gaps -= len(positions)
+        start = len(self.row_partition)
+        return positions + list(range(start, start + count - len(positions)))
+
+    def archived_runs(self) -> Dict[str, List[List[int]]]: #"YYYY-MM" -> [start, count] runs of global positions
+        numbers = {self.period_numbers[period]: period for period in self.archived}
+        runs = {period: [] for period in self.archived}
+        if not numbers:
+            return runs
+        for position, number in enumerate(self.row_partition):
+            period = numbers.get(number)
+            if period is None:
+                continue
+            month = runs[period]
+            if month and month[-1][0] + month[-1][1] == position:
+                month[-1][1] += 1
+            else:
+                month.append([position, 1])
+        return runs
+
+    def _read_archive(self, path: str) -> CheckInStore:
+        with open(path, encoding="utf-8") as f:
+            columns = json.load(f)
+        store = CheckInStore()
+        store.extend(columns["member_id"], columns["timestamp"], columns["registration_checkin"],
+                     columns["registration_session"], columns["global_index"])
+        return store
+
+    def _load_archive(self, period: str) -> CheckInStore:
+        path = self.archived.pop(period)
+        if self.peeked is not None and self.peeked[0] == period:
+            store, self.peeked = self.peeked[1], None
+        else:
+            store = self._read_archive(path)
+        self.partitions[period] = store
+        return store
+
+    def read(self, period: str) -> Optional[CheckInStore]:
+        # a partition's columns without pulling an archived month back into memory for good;
+        # the last archived month read is kept, so a run of reads from it opens the file once
+        store = self.partitions.get(period)
+        if store is None and period in self.archived:
+            if self.peeked is None or self.peeked[0] != period:
+                self.peeked = (period, self._read_archive(self.archived[period]))
+            store = self.peeked[1]
+        return store
+
+    def to_columns(self) -> dict:
+        # check-in columns of the months in memory, in global order with the archived months' positions
+        # left out (archived_runs has those); registrations listed month by month in the order they were made
+        archived = {self.period_numbers[period] for period in self.archived}
+        ordinal = array("i", [-1]) * len(self.row_partition)  # global index -> position in these columns
+        count = 0
+        for index, number in enumerate(self.row_partition):
+            if number not in archived:
+                ordinal[index] = count
+                count += 1
+        member_ids = [None] * count
+        timestamps = [0.0] * count
+        registration_checkins, registration_sessions = [], []
+        for period in self.periods():
+            store = self.partitions.get(period)
+            if store is None:
+                continue
+            for row, index in enumerate(store.global_index):
+                member_ids[ordinal[index]] = store.member_ids[store.members[row]]
+                timestamps[ordinal[index]] = store.timestamps[row]
+            registration_checkins.extend(ordinal[store.global_index[row]] for row in store.registration_checkin)
+            registration_sessions.extend(store.session_ids[code] for code in store.registration_session)
+        return {"member_id": member_ids, "timestamp": timestamps,
+                "registration_checkin": registration_checkins, "registration_session": registration_sessions}
+
+    def __len__(self) -> int:
+        return len(self.row_partition)
+
+    def __getitem__(self, index: int) -> CheckIn:
+        if index < 0:
+            index += len(self.row_partition)
+        if not 0 <= index < len(self.row_partition):
+            raise IndexError("check-in index out of range")
+        return CheckIn(self, index)
+
+    def __iter__(self) -> Iterator[CheckIn]:
+        for index in range(len(self.row_partition)):
+            yield CheckIn(self, index)
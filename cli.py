@@ -0,0 +1,205 @@
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from checkin_store import current_period
+from gym_oop import MEMBER_ID_PATTERN, GymOnTheRock, Session
+from metrics import Metrics
+from reports import CsvSink, JsonLinesSink
+from storage import StorageInUse, open_storage
+
+# Headless entry point for cron jobs and scripts: no login, no menu, no keyboard needed.
+#   python cli.py report [--period 2026-10] [--csv reports/] [--jsonl]
+#   python cli.py import --members members.csv --checkins checkins.jsonl
+#   python cli.py import --checkins more_checkins.csv --id-map member_id_map.csv
+#   python cli.py bill M0007 [--period 2026-10] [--json]
+#   python cli.py add-session "Yoga" 800 Morning
+#   python cli.py checkin M0007 --session S01 --session S02
+#   python cli.py export billing-2026-09.gymcol --period 2026-09
+#   python cli.py --data billing-2026-09.gymcol report   (reruns the reports of an exported month, read-only)
+#   python cli.py menu            (the interactive menu, same as python gym_oop.py)
+# Errors go to stderr with the usual codes and a non-zero exit status.
+
+SCHEDULES = ("Morning", "Evening", "Both")
+
+
+class CommandError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(f"[+]Error {code}: {message}")
+
+
+def report(gym: GymOnTheRock, args):
+    sinks = []
+    if args.csv:
+        sinks.append(CsvSink(args.csv))
+    if args.jsonl:
+        sinks.append(JsonLinesSink(sys.stdout))
+    # an exported month reports on its own period unless told otherwise
+    gym.generate_reports(sinks or None, args.period or getattr(gym.storage, "period", None))
+    if args.csv:
+        print(f"[+]Report written to {args.csv}", file=sys.stderr if args.jsonl else sys.stdout)
+
+
+def import_files(gym: GymOnTheRock, args):
+    from ingest import ErrorReport, run_imports  # pulls in the process pool, so only here
+    if not args.members and not args.checkins:
+        raise CommandError("2003", "import needs --members and/or --checkins")
+    errors = ErrorReport(args.errors)
+    try:
+        run_imports(gym, args, errors)
+    finally:
+        errors.close()
+    if errors.count:
+        print(f"[+]{errors.count} rows rejected, see {args.errors}")
+
+
+def member_bills(gym: GymOnTheRock, period):
+    # every member's bill in one batched pass of the billing engine; the ledger one member at a time without numpy
+    try:
+        from billing_engine import compute_member_bills
+    except ImportError:
+        for member_id in gym.members:
+            yield gym.get_member_bill(member_id, period)
+        return
+    period = period or current_period()
+    bills = compute_member_bills(gym, period=period)
+    plans = gym.membership_plans
+    for member_id, membership_cost, sessions, session_cost, total in zip(
+            bills["member_ids"], bills["membership_cost"].tolist(), bills["sessions"].tolist(),
+            bills["session_cost"].tolist(), bills["total"].tolist()):
+        # the ledger's sums stay whole numbers when nothing is discounted; printed the same way here
+        if not session_cost or not plans[gym.members[member_id].membership_type].discount:
+            session_cost, total = int(session_cost), int(total)
+        yield {"member_id": member_id, "period": period, "membership_cost": membership_cost, "sessions": sessions,
+               "session_cost": session_cost, "total": total}
+
+
+def bill(gym: GymOnTheRock, args):
+    if args.member_id.upper() == "ALL":
+        bills = member_bills(gym, args.period)
+    else:
+        member_id = args.member_id.upper()
+        member_bill = gym.get_member_bill(member_id, args.period)
+        if member_bill is None:
+            raise CommandError("1006", f"Enter valid member ID ({member_id})")
+        bills = [member_bill]
+    for member_bill in bills:
+        if args.json:
+            print(json.dumps(member_bill))
+        else:
+            print(f"[+]{member_bill['member_id']} {member_bill['period']}: membership ${member_bill['membership_cost']}, "
+                  f"{member_bill['sessions']} sessions ${member_bill['session_cost']}, "
+                  f"Total monthly fee: ${member_bill['total']}")
+
+
+def add_session(gym: GymOnTheRock, args):
+    schedule = args.schedule.strip().title()
+    if schedule not in SCHEDULES:
+        raise CommandError("2003", "Schedule = (Morning|Evening|Both)")
+    if args.cost < 0:
+        raise CommandError("2003", "cost can't be negative")
+    session_id = gym.generate_session_id()
+    gym._store_session(Session(session_id, args.name.strip(), args.cost, schedule))
+    print(f"[+]You have successfully added session {session_id}")
+
+
+def checkin(gym: GymOnTheRock, args):
+    # the same checks member_checkin makes at the kiosk, all done before anything is saved
+    member_id = args.member_id.strip().upper()
+    if not MEMBER_ID_PATTERN.match(member_id):
+        raise CommandError("2020", "ID must be M and 4 or more digits eg. M0007")
+    if member_id not in gym.members:
+        raise CommandError("1006", "Enter valid member ID")
+    session_ids = [sid.strip().upper() for sid in args.session]
+    for sid in session_ids:
+        if sid not in gym.sessions:
+            raise CommandError("1010", f"Invalid session ID ({sid})")
+    with gym.batch():
+        new_checkin = gym._record_checkin(member_id, datetime.now())
+        for sid in session_ids:
+            new_checkin.add_session(sid)
+    print(f"[+]Welcome {gym.members[member_id].first_name}, check-in {new_checkin.index}")
+    for sid in session_ids:
+        print(f"[+]You registered for {gym.sessions[sid].name}")
+
+
+def export(gym: GymOnTheRock, args):
+    from columnar import export_columnar
+    rows = export_columnar(gym, args.output, args.period)
+    print(f"[+]Exported {rows['members']} members, {rows['check_ins']} check-ins and "
+          f"{rows['registrations']} registrations to {args.output}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gym-On-The-Rock without the menu")
+    parser.add_argument("--data", default="gym_data", help="storage location (a directory, a .db file for sqlite, "
+                        "or a .gymcol export to read from)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("report", help="print or export the reports")
+    command.add_argument("--period", help="billing month YYYY-MM (default: this month)")
+    command.add_argument("--csv", help="write one csv per section into this directory")
+    command.add_argument("--jsonl", action="store_true", help="write json lines to stdout")
+    command.set_defaults(run=report)
+
+    command = commands.add_parser("import", help="bulk import members and check-ins")
+    command.add_argument("--members", help="members file (.csv or .jsonl)")
+    command.add_argument("--checkins", help="check-ins file (.csv or .jsonl)")
+    command.add_argument("--errors", default="import_errors.csv", help="where rejected rows are written")
+    command.add_argument("--workers", type=int, help="validation processes (default: one per cpu)")
+    command.add_argument("--id-map", help="old -> new member ids: written by a members import "
+                         "(default member_id_map.csv), read by a check-ins import")
+    command.set_defaults(run=import_files)
+
+    command = commands.add_parser("bill", help="a member's monthly fee")
+    command.add_argument("member_id", help="member id, or ALL for every member")
+    command.add_argument("--period", help="billing month YYYY-MM (default: this month)")
+    command.add_argument("--json", action="store_true", help="one json object per member")
+    command.set_defaults(run=bill)
+
+    command = commands.add_parser("add-session", help="add a new session")
+    command.add_argument("name")
+    command.add_argument("cost", type=int, help="whole dollars")
+    command.add_argument("schedule", help="Morning, Evening or Both")
+    command.set_defaults(run=add_session)
+
+    command = commands.add_parser("checkin", help="check a member in")
+    command.add_argument("member_id")
+    command.add_argument("--session", action="append", default=[], help="session id to register for; repeatable")
+    command.set_defaults(run=checkin)
+
+    command = commands.add_parser("export", help="write one month as memory-mappable columns for analytics")
+    command.add_argument("output", help="file to write, e.g. billing-2026-09.gymcol")
+    command.add_argument("--period", help="billing month YYYY-MM (default: this month)")
+    command.set_defaults(run=export)
+
+    command = commands.add_parser("menu", help="the interactive menu")
+    command.set_defaults(run=None)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        storage = open_storage(args.data)
+    except StorageInUse as error:  # e.g. the menu or the service has it open
+        print(error, file=sys.stderr)
+        return 1
+    gym = GymOnTheRock(storage, Metrics.from_env())
+    if args.run is None:
+        gym.run()  # closes the gym itself
+        return 0
+    try:
+        args.run(gym, args)
+        return 0
+    except CommandError as error:
+        print(error, file=sys.stderr)
+        return 1
+    finally:
+        # changes are in the log already; the snapshot is left to the next big write or the menu
+        gym.close(snapshot=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
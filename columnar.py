@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from checkin_store import CheckInStore, current_period
+from storage import Storage
+
+# One billing month exported as fixed-width columns, so analytics tools can mmap the file and
+# read a column in place instead of parsing report output. The same file opens as a read-only
+# GymOnTheRock (open_storage picks it up by the .gymcol extension) to rerun that month's reports.
+#
+# Layout, all integers little-endian:
+#   bytes 0-7    magic b"GYMCOL1\0"
+#   bytes 8-11   uint32 header length N
+#   bytes 12-    N bytes of UTF-8 json:
+#                {"version": 1, "period": "YYYY-MM", "created": epoch,
+#                 "tables": {table: {"rows": n, "columns": {column: {"type": t, "offset": o, "length": l}}}}}
+#   data         starts at 12 + N rounded up to 64; each column is `length` bytes at data + `offset`,
+#                every offset a multiple of 64
+# Column types: "i4" / "i8" signed integers, "f8" IEEE double, "S<w>" UTF-8 padded with NULs to w bytes.
+# With numpy a column is np.frombuffer(mapped, "<i4" / "<f8" / "S<w>", count=rows, offset=data + offset).
+#
+# Tables (columns ending in _row / the check-in and registration codes are row numbers in another table):
+#   members        member_id, first_name, last_name, contact, membership_type, date
+#   plans          membership_type, cost, included_sessions, discount
+#   sessions       session_id, name, cost, schedule, instructor_id ("" if nobody), registrations, earnings
+#   prices         session_row, effective, cost                   every price a session has had
+#   assignments    session_row, effective, instructor_id          every instructor a session has had
+#   instructors    instructor_id, first_name, last_name
+#   checkin_members / registration_sessions   member_id / session_id, the ids the codes below stand for
+#   check_ins      member (checkin_members row), timestamp         the month's check-ins in arrival order
+#   registrations  checkin (check_ins row), session (registration_sessions row), price
+#                  in the order they were made, priced at the rate in effect at the check-in
+#   monthly_fees   member_row, sessions, membership_cost, session_cost, total
+# Fees and earnings are worked out from the exported check-ins the same way the ledger does it,
+# so the file always agrees with itself even if check-ins were still arriving during the export.
+
+MAGIC = b"GYMCOL1\0"
+ALIGN = 64
+ARRAY_TYPES = {"i4": "i", "i8": "q", "f8": "d"}  # column type -> array / memoryview format
+BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _numbers(kind: str, values) -> Tuple[str, bytes]:
+    column = values if isinstance(values, array) else array(ARRAY_TYPES[kind], values)
+    if BIG_ENDIAN:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return kind, column.tobytes()
+
+
+def _strings(values: List[str]) -> Tuple[str, bytes]:
+    encoded = [value.encode() for value in values]
+    width = max(map(len, encoded), default=0) or 1
+    return f"S{width}", b"".join(value.ljust(width, b"\0") for value in encoded)
+
+
+def write_columns(path: str, tables: Dict[str, Dict[str, Tuple[str, bytes]]], period: str) -> dict:
+    # tables: table -> column -> (type, raw bytes); written beside the target and renamed into place.
+    # Returns the header. The type's number is the width of one row in bytes, which gives the row count
+    header = {"version": 1, "period": period, "created": time.time(), "tables": {}}
+    chunks, offset = [], 0
+    for table, columns in tables.items():
+        described = {}
+        for name, (kind, data) in columns.items():
+            described[name] = {"type": kind, "offset": offset, "length": len(data)}
+            chunks.append((offset, data))
+            offset = _align(offset + len(data))
+        kind, data = next(iter(columns.values()))
+        header["tables"][table] = {"rows": len(data) // int(kind[1:]), "columns": described}
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    data_start = _align(12 + len(encoded))
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        for chunk_offset, data in chunks:
+            file.seek(data_start + chunk_offset)
+            file.write(data)
+        file.truncate(data_start + offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+def export_columnar(gym, path: str, period: Optional[str] = None) -> dict:
+    # writes one month (this month by default) from a point-in-time view; returns the row count of each table
+    period = period or current_period()
+    with gym.read_view() as view:
+        members = list(view.members.values())
+        plans = view.membership_plans
+        sessions = view.sessions
+        instructors = view.instructors
+        assignments = view.session_instructors
+
+        # cut the month's columns where they are now: registrations first, so every one kept points
+        # at a check-in row that is kept too
+        store = gym.check_ins.read(period) or CheckInStore()
+        registration_count = len(store.registration_session)
+        checkin_count = len(store.members)
+        registration_checkin = store.registration_checkin[:registration_count]
+        registration_session = store.registration_session[:registration_count]
+        checkin_members = store.members[:checkin_count]
+        timestamps = store.timestamps[:checkin_count]
+        member_ids = store.member_ids[:]
+        session_ids = store.session_ids[:]
+
+        # price every registration and bill it the way the ledger does, from the rows being written
+        price_at = gym.earnings.price_at
+        member_plans = gym.ledger.plans
+        prices = array("q")
+        bills = {}  # member_id -> [sessions, paid, charged]
+        earnings = {}  # session_id -> [registrations, earned]
+        for checkin, code in zip(registration_checkin, registration_session):
+            session_id = session_ids[code]
+            price = price_at(session_id, timestamps[checkin])
+            prices.append(price)
+            totals = earnings.setdefault(session_id, [0, 0])
+            totals[0] += 1
+            totals[1] += price
+            member_id = member_ids[checkin_members[checkin]]
+            plan = member_plans.get(member_id)
+            if plan is not None:
+                bill = bills.setdefault(member_id, [0, 0, 0])
+                bill[0] += 1
+                if bill[0] > plan.included_sessions:
+                    bill[1] += price
+                    bill[2] += price * (1 - plan.discount)
+
+        session_rows = {sid: row for row, sid in enumerate(sessions)}
+        history = [(session_rows[sid], effective, cost) for sid, (times, costs) in gym.earnings.prices.items()
+                   if sid in session_rows for effective, cost in zip(times, costs)]
+        taught = [(session_rows[sid], effective, iid) for sid, (times, instructors) in view.assignments.items()
+                  if sid in session_rows for effective, iid in zip(times, instructors)]
+
+    member_rows = {member.member_id: row for row, member in enumerate(members)}
+    fees = {"member_row": array("i"), "sessions": array("i"), "membership_cost": array("q"),
+            "session_cost": array("d"), "total": array("d")}
+    for member in members:
+        plan = plans[member.membership_type]
+        count, _, session_cost = bills.get(member.member_id, (0, 0, 0))
+        fees["member_row"].append(member_rows[member.member_id])
+        fees["sessions"].append(count)
+        fees["membership_cost"].append(plan.cost)
+        fees["session_cost"].append(session_cost)
+        fees["total"].append(plan.cost + session_cost)
+
+    tables = {
+        "members": {field: _strings([getattr(member, field) for member in members])
+                    for field in ("member_id", "first_name", "last_name", "contact", "membership_type", "date")},
+        "plans": {"membership_type": _strings(list(plans)),
+                  "cost": _numbers("i8", [plan.cost for plan in plans.values()]),
+                  "included_sessions": _numbers("i4", [plan.included_sessions for plan in plans.values()]),
+                  "discount": _numbers("f8", [plan.discount for plan in plans.values()])},
+        "sessions": {"session_id": _strings(list(sessions)),
+                     "name": _strings([s.name for s in sessions.values()]),
+                     "cost": _numbers("i8", [s.cost for s in sessions.values()]),
+                     "schedule": _strings([s.schedule for s in sessions.values()]),
+                     "instructor_id": _strings([assignments.get(sid, "") for sid in sessions]),
+                     "registrations": _numbers("i4", [earnings.get(sid, (0, 0))[0] for sid in sessions]),
+                     "earnings": _numbers("i8", [earnings.get(sid, (0, 0))[1] for sid in sessions])},
+        "prices": {"session_row": _numbers("i4", [row for row, _, _ in history]),
+                   "effective": _numbers("f8", [effective for _, effective, _ in history]),
+                   "cost": _numbers("i8", [cost for _, _, cost in history])},
+        "assignments": {"session_row": _numbers("i4", [row for row, _, _ in taught]),
+                        "effective": _numbers("f8", [effective for _, effective, _ in taught]),
+                        "instructor_id": _strings([iid for _, _, iid in taught])},
+        "instructors": {"instructor_id": _strings(list(instructors)),
+                        "first_name": _strings([i.first_name for i in instructors.values()]),
+                        "last_name": _strings([i.last_name for i in instructors.values()])},
+        "checkin_members": {"member_id": _strings(member_ids)},
+        "registration_sessions": {"session_id": _strings(session_ids)},
+        "check_ins": {"member": _numbers("i4", checkin_members), "timestamp": _numbers("f8", timestamps)},
+        "registrations": {"checkin": _numbers("i4", registration_checkin),
+                          "session": _numbers("i4", registration_session), "price": _numbers("i8", prices)},
+        "monthly_fees": {name: _numbers(kind, fees[name]) for name, kind in
+                         (("member_row", "i4"), ("sessions", "i4"), ("membership_cost", "i8"),
+                          ("session_cost", "f8"), ("total", "f8"))},
+    }
+    header = write_columns(path, tables, period)
+    return {table: described["rows"] for table, described in header["tables"].items()}
+
+
+class ColumnarFile: #an export opened read-only through mmap; numeric columns are views on the mapped pages
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:8] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar gym export")
+        (length,) = struct.unpack_from("<I", self.map, 8)
+        self.header = json.loads(self.map[12:12 + length])
+        self.data_start = _align(12 + length)
+        self.period = self.header["period"]
+        self.tables = self.header["tables"]
+
+    def rows(self, table: str) -> int:
+        return self.tables[table]["rows"]
+
+    def _raw(self, table: str, column: str) -> Tuple[str, memoryview]:
+        described = self.tables[table]["columns"][column]
+        start = self.data_start + described["offset"]
+        return described["type"], memoryview(self.map)[start:start + described["length"]]
+
+    def column(self, table: str, column: str) -> memoryview:
+        # zero-copy; release() it (or use it in a with-block) before closing the file
+        kind, raw = self._raw(table, column)
+        if kind not in ARRAY_TYPES or BIG_ENDIAN:
+            raw.release()
+            raise TypeError(f"{table}.{column} ({kind}) can't be viewed in place here, use numbers() or strings()")
+        return raw.cast(ARRAY_TYPES[kind])
+
+    def numbers(self, table: str, column: str) -> list:
+        kind, raw = self._raw(table, column)
+        values = array(ARRAY_TYPES[kind])
+        with raw:
+            values.frombytes(raw)
+        if BIG_ENDIAN:
+            values.byteswap()
+        return values.tolist()
+
+    def strings(self, table: str, column: str) -> List[str]:
+        kind, raw = self._raw(table, column)
+        width = int(kind[1:])
+        with raw:
+            data = raw.tobytes()
+        return [data[start:start + width].rstrip(b"\0").decode() for start in range(0, len(data), width)]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class ColumnarSnapshot(Storage): #a read-only storage backend over an export, for report reruns on past months
+    def __init__(self, path: str):
+        self.columns = ColumnarFile(path)
+        self.period = self.columns.period
+
+    def load(self):
+        columns = self.columns
+        members = [list(row) for row in zip(*(columns.strings("members", field) for field in
+                   ("member_id", "first_name", "last_name", "contact", "membership_type", "date")))]
+        session_ids = columns.strings("sessions", "session_id")
+        sessions = [list(row) for row in zip(session_ids, columns.strings("sessions", "name"),
+                                             columns.numbers("sessions", "cost"),
+                                             columns.strings("sessions", "schedule"))]
+        prices = {}
+        for row, effective, cost in zip(columns.numbers("prices", "session_row"),
+                                        columns.numbers("prices", "effective"), columns.numbers("prices", "cost")):
+            prices.setdefault(session_ids[row], []).append([effective, cost])
+        instructors = [list(row) for row in zip(*(columns.strings("instructors", field) for field in
+                       ("instructor_id", "first_name", "last_name")))]
+        if "assignments" in columns.tables:
+            assignments = [[session_ids[row], effective, iid] for row, effective, iid in zip(
+                columns.numbers("assignments", "session_row"), columns.numbers("assignments", "effective"),
+                columns.strings("assignments", "instructor_id"))]
+        else:  # exported before assignments were dated: whoever teaches it now, all along
+            assignments = [[sid, iid] for sid, iid in zip(session_ids, columns.strings("sessions", "instructor_id"))
+                           if iid]
+
+        # the codes are turned back into ids here; GymOnTheRock interns them again as it loads them
+        member_ids = columns.strings("checkin_members", "member_id")
+        registration_sessions = columns.strings("registration_sessions", "session_id")
+        state = {
+            "users": [],  # passwords are never exported
+            "members": members,
+            "sessions": sessions,
+            "instructors": instructors,
+            "assignments": assignments,
+            "prices": prices,
+            "check_ins": {"member_id": [member_ids[code] for code in columns.numbers("check_ins", "member")],
+                          "timestamp": columns.numbers("check_ins", "timestamp")},
+            "registrations": {"checkin": columns.numbers("registrations", "checkin"),
+                              "session_id": [registration_sessions[code]
+                                             for code in columns.numbers("registrations", "session")]},
+        }
+        return state, []
+
+    def append(self, kind, record):
+        raise ValueError(f"{self.columns.path} is a read-only export")
+
+    def append_batch(self, events):
+        raise ValueError(f"{self.columns.path} is a read-only export")
+
+    def close(self):
+        self.columns.close()
+
+
+def load_columnar(path: str, metrics=None):
+    # a GymOnTheRock holding just the exported month; reports for that period come out as they did live
+    from gym_oop import GymOnTheRock
+    return GymOnTheRock(ColumnarSnapshot(path), metrics)
+
@@ -0,0 +1,109 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from gym_oop import GymOnTheRock, Instructor, Member, Session
+from storage import SQLiteStorage, open_storage
+
+# Synthetic gyms for benchmarks and load tests. A scale is the number of check-ins; members,
+# sessions and instructors grow with it. Check-ins are spread over the last few months with
+# morning and evening peaks, and members on bigger plans come in more often.
+
+SCALES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1M": 1_000_000,
+    "10M": 10_000_000,
+}
+
+FIRST_NAMES = ["Aaliyah", "Andre", "Brianna", "Camille", "Damion", "Dwayne", "Ebony", "Gavin", "Imani", "Jada",
+               "Kemar", "Keisha", "Latoya", "Marlon", "Nadia", "Omari", "Petagay", "Rohan", "Shanice", "Tevin"]
+LAST_NAMES = ["Brown", "Campbell", "Clarke", "Francis", "Grant", "Henry", "Johnson", "Lewis", "McKenzie", "Reid",
+              "Robinson", "Smith", "Thomas", "Walker", "Williams", "Wright"]
+CLASSES = [("MA Classes", "Evening"), ("Spin Classes", "Morning"), ("Yoga", "Morning"), ("HIIT", "Evening"),
+           ("Boxing", "Evening"), ("Pilates", "Morning"), ("Zumba", "Both"), ("CrossFit", "Both"),
+           ("Aqua Aerobics", "Morning"), ("Kettlebells", "Evening"), ("Bootcamp", "Both"), ("Stretch", "Both")]
+INSTRUCTORS = ["Jaxon Steele", "Blake Titan", "Ryder Knox", "Logan Vega", "Dante Storm",
+               "Mira Stone", "Tessa Bolt", "Kai Mercer"]
+
+VISITS_PER_MONTH = {"Platinum": 12, "Diamond": 8, "Gold": 5, "Standard": 3}  # relative check-in frequency
+PLAN_MIX = {"Platinum": 0.1, "Diamond": 0.2, "Gold": 0.3, "Standard": 0.4}  # share of members on each plan
+PEAK_HOURS = [6, 7, 8, 12, 17, 18, 19, 20]
+
+
+def generate_gym(checkins: int, months: int = 3, seed: int = 7, storage=None,
+                 chunk_size: int = 500_000) -> GymOnTheRock:
+    rng = random.Random(seed)
+    gym = GymOnTheRock(storage)
+    member_count = max(10, checkins // 10)
+
+    # sessions and instructors, on top of the two sample sessions
+    for name, schedule in CLASSES[2:2 + max(2, min(len(CLASSES) - 2, checkins // 100_000 + 2))]:
+        gym._store_session(Session(gym.generate_session_id(), name, rng.randrange(500, 1600, 100), schedule))
+    for full_name in INSTRUCTORS:
+        first, last = full_name.split()
+        gym._store_instructor(Instructor(gym.generate_instructor_id(), first, last))
+    instructor_ids = list(gym.instructors)
+    for n, session_id in enumerate(gym.sessions):  # each class gets a teacher, round robin, since before the history
+        gym._assign_session(session_id, instructor_ids[n % len(instructor_ids)], 0.0)
+
+    # members, in one batch so a storage backend writes them in one go
+    now = datetime.now()
+    start = now - timedelta(days=30 * months)
+    plans = rng.choices(list(PLAN_MIX), weights=list(PLAN_MIX.values()), k=member_count)
+    with gym.batch():
+        for member_id, plan in zip(gym.allocate_member_ids(member_count), plans):
+            joined = start - timedelta(days=rng.randint(0, 365))
+            gym._store_member(Member(member_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                                     f"876-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}", plan,
+                                     joined.strftime("%Y-%m-%d")))
+
+    # check-ins, loaded as columns a chunk at a time
+    member_ids = list(gym.members)
+    weights = [VISITS_PER_MONTH[plan] for plan in plans]
+    session_ids = list(gym.sessions)
+    start_seconds = start.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    days = max(1, (now - start).days)
+    remaining = checkins
+    while remaining:
+        count = min(chunk_size, remaining)
+        remaining -= count
+        who = rng.choices(member_ids, weights=weights, k=count)
+        timestamps = sorted(start_seconds + rng.randrange(days) * 86400 + rng.choice(PEAK_HOURS) * 3600
+                            + rng.randrange(3600) for _ in range(count))
+        registration_checkins, registration_sessions = [], []
+        for row in range(count):
+            for _ in range(rng.choice((0, 1, 1, 1, 2))):
+                registration_checkins.append(row)
+                registration_sessions.append(rng.choice(session_ids))
+        if isinstance(storage, SQLiteStorage):
+            # sqlite keeps no snapshot of its own, so the rows have to go into its tables as well
+            first = len(gym.check_ins)
+            events = [("checkin", {"checkin": first + row, "member_id": member_id, "timestamp": timestamp})
+                      for row, (member_id, timestamp) in enumerate(zip(who, timestamps))]
+            events += [("checkin_session", {"checkin": first + row, "session_id": session_id})
+                       for row, session_id in zip(registration_checkins, registration_sessions)]
+            storage.append_batch(events)
+        gym._load_checkins(who, timestamps, registration_checkins, registration_sessions)
+    return gym
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Gym-On-The-Rock data set")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k", help="number of check-ins")
+    parser.add_argument("--months", type=int, default=3, help="months of check-in history")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--data", default="gym_data", help="storage location to write the snapshot to")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    storage = open_storage(args.data)
+    gym = generate_gym(SCALES[args.scale], args.months, args.seed, storage)
+    gym.close()  # writes a snapshot holding everything, including the bulk-loaded check-ins
+    print(f"[+]{len(gym.members)} members, {len(gym.check_ins)} check-ins written to {args.data} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,163 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
+import hashlib
+import hmac
+import os
 import re
-from typing import Dict, List, Optional
-from consolemenu import ConsoleMenu
-from consolemenu.items import FunctionItem
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from checkin_store import CheckIn, PartitionedCheckIns, current_period, period_bounds, period_of
+from metrics import Metrics
+from reports import ConsoleSink, ReportSink, write_report
+from search_index import MemberSearchIndex
+from storage import Storage, StorageInUse, WALStorage
+
+MEMBER_ID_PATTERN = re.compile(r"^M\d{4,}$")  # what member_checkin accepts, e.g. M0007 or M12345
+
+def hash_password(password: str) -> str: #salted scrypt hash, stored as scrypt$n$r$p$salt$digest
+    n, r, p = 2 ** 14, 8, 1
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def verify_password(password: str, password_hash: str) -> bool:
+    _, n, r, p, salt, digest = password_hash.split("$")
+    check = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p))
+    return hmac.compare_digest(check, bytes.fromhex(digest))
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> str:
+    # checked against when the username doesn't exist, so a wrong username takes as long as a wrong password;
+    # made on first use rather than at import, scrypt is too slow to pay for on every start
+    return hash_password("not a real password")
 
 class User: #classes for loging in
-    def __init__(self, username: str, password: str):
+    __slots__ = ("username", "password_hash")
+    
+    def __init__(self, username: str, password_hash: str):
         self.username = username
-        self.password = password
+        self.password_hash = password_hash
+
+class IdAllocator: #hands out ids in increasing order and never the same one twice, e.g. M0001 ... M9999, M10000
+    def __init__(self, prefix: str, width: int, on_extend: Optional[Callable[[int], None]] = None,
+                 block: int = 100):
+        self.prefix = prefix
+        self.width = width  # minimum digits; bigger numbers just make longer ids
+        self.on_extend = on_extend  # called with the new limit before any id below it is handed out
+        self.block = block
+        self.next_number = 1
+        self.limit = 1  # numbers below this are reserved; saved, so reserving up to it again costs no write
+        self.saved_next = None  # next_number as a clean shutdown saved it; None once ids may have gone out since
+        self.issued = False  # handed out ids in this process, so close() has a next number to save
+        self.lock = threading.Lock()
+    
+    def format(self, number: int) -> str:
+        return f"{self.prefix}{number:0{self.width}d}"
+    
+    def reserve(self, count: int) -> range: #numbers for `count` ids nobody else will get, e.g. for a bulk import
+        with self.lock:
+            start = self.next_number
+            self.next_number += count
+            limit = self.limit
+            if self.next_number > limit:
+                # the limit moves a block at a time so only every block-th id costs a write
+                limit = self.next_number + self.block
+            if limit != self.limit or self.saved_next is not None:
+                # the first id after a clean restart saves the limit again too, so storage stops claiming the
+                # exact next number and a crash from here on carries on from the limit
+                if self.on_extend is not None:
+                    self.on_extend(limit)
+                self.limit = limit
+                self.saved_next = None
+            self.issued = True
+            return range(start, start + count)
+    
+    def next_id(self) -> str:
+        return self.format(self.reserve(1).start)
+    
+    def observe(self, identifier: str): #skips past ids that were made elsewhere, e.g. loaded from older data
+        digits = identifier[len(self.prefix):]
+        if identifier.startswith(self.prefix) and digits.isdigit():
+            number = int(digits)
+            if number >= self.next_number:
+                self.next_number = number + 1
+                self.limit = max(self.limit, self.next_number)
+    
+    def restore(self, limit: int, next_number: Optional[int] = None):
+        # a clean shutdown saved the exact next number; otherwise (a crash, or a limit saved while running)
+        # any number below the limit may have been handed out, stored or not, so the next id comes after it
+        self.limit = max(self.limit, limit)
+        if next_number is None:
+            self.next_number = max(self.next_number, limit)
+        else:
+            self.next_number = next_number
+        self.saved_next = next_number
+    
+    def saved(self): #close() has written next_number to storage
+        self.saved_next = self.next_number
+
+class LockoutTable: #failed login counts that expire on their own so the table can't grow forever
+    def __init__(self, max_attempts: int = 3, lockout_duration: timedelta = timedelta(minutes=5),
+                 max_entries: int = 100000):
+        self.max_attempts = max_attempts
+        self.lockout_duration = lockout_duration
+        self.max_entries = max_entries
+        # username -> {attempts, lockout_time, expires}, oldest activity first. Locked accounts are kept
+        # apart so a flood of failures for other names can only ever push out counts, never a lockout
+        self.entries = OrderedDict()
+        self.locked = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def _evict(self, now: datetime):
+        # an entry lives for lockout_duration after its last failure, which is also when any lockout ends
+        for entries in (self.entries, self.locked):
+            while entries:
+                username, entry = next(iter(entries.items()))
+                if entry["expires"] > now:
+                    break
+                del entries[username]
+    
+    def locked_for(self, username: str) -> Optional[timedelta]: #time left on a lockout, None if not locked
+        now = datetime.now()
+        with self.lock:
+            self._evict(now)
+            entry = self.locked.get(username)
+            if entry and now < entry["lockout_time"]:
+                return entry["lockout_time"] - now
+            return None
+    
+    def record_failure(self, username: str) -> int: #returns the number of failed attempts so far
+        now = datetime.now()
+        with self.lock:
+            self._evict(now)
+            entry = self.entries.pop(username, None) or self.locked.pop(username, None)
+            if entry is None:
+                if len(self.entries) + len(self.locked) >= self.max_entries:
+                    if not self.entries:
+                        return 1  # full of lockouts: none is dropped, and this failure isn't counted
+                    self.entries.popitem(last=False)  # the oldest count that isn't a lockout makes room
+                entry = {"attempts": 0, "lockout_time": None}
+            entry["attempts"] += 1
+            if entry["attempts"] >= self.max_attempts:
+                entry["lockout_time"] = now + self.lockout_duration
+            entry["expires"] = now + self.lockout_duration
+            (self.locked if entry["lockout_time"] else self.entries)[username] = entry
+            return entry["attempts"]
+    
+    def record_success(self, username: str):
+        with self.lock:
+            self.entries.pop(username, None)
+            self.locked.pop(username, None)
 
 class Member: #class with information about the members
+    __slots__ = ("member_id", "first_name", "last_name", "contact", "membership_type", "date")
+    
     def __init__(self, member_id: str, first_name: str, last_name: str,
                  contact: str, membership_type: str, date: str):
         self.member_id = member_id
@@ -23,27 +171,22 @@ class Member: #class with information about the members
         return f"{self.first_name} {self.last_name}"
 
 class Session: #class for the session give you the name of the session like spin class cost and time if it in the day or night
+    __slots__ = ("session_id", "name", "cost", "schedule")
+    
     def __init__(self, session_id: str, name: str, cost: int, schedule: str):
         self.session_id = session_id
         self.name = name
         self.cost = cost
         self.schedule = schedule
 
-class CheckIn: #information you would need when you check in at the front desk
-    def __init__(self, member_id: str, timestamp: datetime):
-        self.member_id = member_id
-        self.timestamp = timestamp
-        self.sessions = []
-    
-    def add_session(self, session_id: str):
-        self.sessions.append(session_id)
-
 class Instructor: #information on the person teaching the session
+    __slots__ = ("instructor_id", "first_name", "last_name", "sessions")
+    
     def __init__(self, instructor_id: str, first_name: str, last_name: str):
         self.instructor_id = instructor_id
         self.first_name = first_name
         self.last_name = last_name
-        self.sessions = []
+        self.sessions = []  # ids of the sessions they teach, kept in step with GymOnTheRock.session_instructors
     
     def get_full_name(self) -> str:# combines first and last name to make full name
         return f"{self.first_name} {self.last_name}"
@@ -54,14 +197,310 @@ class MembershipPlan:
         self.included_sessions = included_sessions
         self.discount = discount
 
-class GymOnTheRock:
+class MemberBill: #running session count and overage for one member
+    __slots__ = ("member_id", "included_sessions", "discount", "session_count", "paid_cost", "charged")
+    
+    def __init__(self, member_id: str, included_sessions: int, discount: float = 0):
+        self.member_id = member_id
+        self.included_sessions = included_sessions
+        self.discount = discount
+        self.session_count = 0
+        self.paid_cost = 0  # whole dollars for the sessions past the plan allowance
+        self.charged = 0  # those sessions less the plan discount, added up one session at a time like the old fee loop
+    
+    def add_session(self, session_id: str, price: int):
+        self.session_count += 1
+        if self.session_count > self.included_sessions:
+            self.paid_cost += price
+            self.charged += price * (1 - self.discount)
+    
+    def session_cost(self):
+        # sessions past the allowance are charged at the price they had on the day, less the plan discount
+        return self.charged
+    
+    def copy(self) -> "MemberBill":
+        bill = MemberBill(self.member_id, self.included_sessions, self.discount)
+        bill.session_count = self.session_count
+        bill.paid_cost = self.paid_cost
+        bill.charged = self.charged
+        return bill
+
+def bill_summary(member_id: str, period: str, plan: MembershipPlan, bill: Optional[MemberBill]) -> dict:
+    session_cost = bill.session_cost() if bill else 0
+    return {
+        "member_id": member_id,
+        "period": period,
+        "membership_cost": plan.cost,
+        "sessions": bill.session_count if bill else 0,
+        "session_cost": session_cost,
+        "total": plan.cost + session_cost,
+    }
+
+class BillingLedger: #one bill per member per month, updated on every check-in so reports never rescan history
+    def __init__(self):
+        self.plans = {}  # member_id -> their MembershipPlan
+        self.periods = {}  # "YYYY-MM" -> {member_id -> MemberBill}
+        self.views = ()  # open StateViews; each keeps the old copy of a bill before it first changes
+    
+    def open_account(self, member_id: str, plan: MembershipPlan):
+        self.plans[member_id] = plan
+    
+    def record_session(self, member_id: str, session_id: str, period: str, price: int):
+        plan = self.plans.get(member_id)
+        if plan is None:
+            return
+        bills = self.periods.setdefault(period, {})
+        bill = bills.get(member_id)
+        for view in self.views:
+            view.keep_bill(period, member_id, bill)
+        if bill is None:
+            bill = bills[member_id] = MemberBill(member_id, plan.included_sessions, plan.discount)
+        bill.add_session(session_id, price)
+    
+    def bill(self, member_id: str, period: str) -> Optional[MemberBill]:
+        return self.periods.get(period, {}).get(member_id)
+    
+    def closed_bills(self, period: str) -> Dict[str, list]: #member_id -> [sessions, paid, charged], for a month that is archived
+        return {mid: [bill.session_count, bill.paid_cost, bill.charged] for mid, bill in self.periods.get(period, {}).items()}
+    
+    def restore_bills(self, period: str, bills: Dict[str, list]):
+        month = self.periods.setdefault(period, {})
+        default = MembershipPlan(0, 0, 0)
+        for mid, (session_count, paid_cost, charged) in bills.items():
+            plan = self.plans.get(mid, default)
+            bill = month[mid] = MemberBill(mid, plan.included_sessions, plan.discount)
+            bill.session_count = session_count
+            bill.paid_cost = paid_cost
+            bill.charged = charged
+
+class SessionEarnings: #registrations and earnings per session per month, priced when the registration happens
     def __init__(self):
+        self.prices = {}  # session_id -> ([effective timestamps], [costs]), oldest first
+        self.periods = {}  # "YYYY-MM" -> {session_id -> [registrations, earnings]}
+        # who taught what, dated the same way as prices, and each month's totals per instructor ("" for
+        # nobody), credited to whoever taught the session when the registration happened
+        self.assignments = {}  # session_id -> ([effective timestamps], [instructor ids]), oldest first
+        self.instructor_periods = {}  # "YYYY-MM" -> {instructor_id -> [registrations, earnings]}
+        self.views = ()  # open StateViews, as for the ledger
+    
+    def set_price(self, session_id: str, cost: int, effective: float):
+        times, costs = self.prices.setdefault(session_id, ([], []))
+        if costs and costs[-1] == cost:
+            return
+        if times and effective <= times[-1]:  # same instant (or an old log without dates): the last price is replaced
+            costs[-1] = cost
+            return
+        times.append(effective)
+        costs.append(cost)
+    
+    def price_at(self, session_id: str, timestamp: float) -> int:
+        history = self.prices.get(session_id)
+        if history is None:
+            return 0  # sessions that no longer exist cost nothing, as before
+        times, costs = history
+        if timestamp >= times[-1]:
+            return costs[-1]
+        # check-ins from before a session's first price pay that first price
+        return costs[max(bisect_right(times, timestamp) - 1, 0)]
+    
+    def assign(self, session_id: str, instructor_id: str, effective: float):
+        times, instructors = self.assignments.setdefault(session_id, ([], []))
+        if instructors and instructors[-1] == instructor_id:
+            return
+        if times and effective <= times[-1]:  # same instant (or an old log without dates): the last one is replaced
+            instructors[-1] = instructor_id
+            return
+        times.append(effective)
+        instructors.append(instructor_id)
+    
+    def instructor_at(self, session_id: str, timestamp: float) -> str: #"" if nobody taught it yet
+        history = self.assignments.get(session_id)
+        if history is None:
+            return ""
+        times, instructors = history
+        position = bisect_right(times, timestamp) - 1
+        return instructors[position] if position >= 0 else ""
+    
+    def record(self, session_id: str, period: str, timestamp: float) -> int: #adds one registration, returns its price
+        price = self.price_at(session_id, timestamp)
+        totals = self.periods.setdefault(period, {}).get(session_id)
+        instructor_id = self.instructor_at(session_id, timestamp)
+        payroll = self.instructor_periods.setdefault(period, {}).get(instructor_id)
+        for view in self.views:
+            view.keep_earnings(period, session_id, totals)
+            view.keep_payroll(period, instructor_id, payroll)
+        if totals is None:
+            self.periods[period][session_id] = [1, price]
+        else:
+            totals[0] += 1
+            totals[1] += price
+        if payroll is None:
+            self.instructor_periods[period][instructor_id] = [1, price]
+        else:
+            payroll[0] += 1
+            payroll[1] += price
+        return price
+    
+    def totals(self, period: str) -> Dict[str, list]: #session_id -> [registrations, earnings] for one month
+        return self.periods.get(period, {})
+    
+    def instructor_totals(self, period: str) -> Dict[str, list]: #instructor_id -> [registrations, earnings]
+        return self.instructor_periods.get(period, {})
+    
+    def restore_totals(self, period: str, totals: Dict[str, list]):
+        self.periods[period] = {sid: list(counts) for sid, counts in totals.items()}
+    
+    def restore_instructor_totals(self, period: str, totals: Dict[str, list]):
+        self.instructor_periods[period] = {iid: list(counts) for iid, counts in totals.items()}
+
+
+def teachers_between(assignments: Dict[str, tuple], session_id: str, start: float, end: float) -> List[str]:
+    # everyone who taught a session at some point in [start, end), with "" if nobody did for part of it
+    times, instructors = assignments.get(session_id, ((), ()))
+    teachers = [""] if not times or start < times[0] else []
+    position = max(bisect_right(times, start) - 1, 0)
+    while position < len(times) and times[position] < end:
+        if instructors[position] not in teachers:
+            teachers.append(instructors[position])
+        position += 1
+    return teachers
+
+_UNCHANGED = object()
+
+class MemberView: #the first `count` members, read-only; safe to walk while members are being added
+    def __init__(self, member_list: List[Member], count: int):
+        self.member_list = member_list
+        self.count = count
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def values(self):
+        member_list = self.member_list
+        for position in range(self.count):
+            yield member_list[position]
+    
+    def items(self):
+        for member in self.values():
+            yield member.member_id, member
+    
+    def __iter__(self):
+        for member in self.values():
+            yield member.member_id
+
+class StateView: #the gym as it was when the view was opened, for reports and billing while writers carry on
+    # Opening one is O(1) apart from copying the few sessions: members are an append-only list cut
+    # at its current length, and bills and session earnings are copy-on-write. While a view is open
+    # the ledger hands it the old copy of an entry just before changing it for the first time, so
+    # only what changes during the view is ever copied.
+    def __init__(self, gym: "GymOnTheRock"):
+        self.ledger = gym.ledger
+        self.live_earnings = gym.earnings
+        self.bills = {}  # (period, member_id) -> MemberBill as it was, None if there wasn't one yet
+        self.earnings = {}  # (period, session_id) -> [registrations, earnings] as they were, or None
+        self.payroll = {}  # (period, instructor_id) -> [registrations, earnings] as they were, or None
+        # registered before anything is read, and under the lock writers hold while they change the ledger
+        # and earnings: a registration already under way finishes first, a later one hands this view its
+        # copies before it touches anything
+        self.view_lock = gym.view_lock
+        with self.view_lock:
+            gym.ledger.views += (self,)
+            gym.earnings.views += (self,)
+            self.assignments = {sid: (list(times), list(instructors))
+                                for sid, (times, instructors) in gym.earnings.assignments.items()}
+        self.metrics = gym.metrics
+        self.membership_plans = gym.membership_plans
+        self.sessions = dict(gym.sessions)  # sessions are replaced on update, never changed in place
+        self.instructors = dict(gym.instructors)
+        self.session_instructors = dict(gym.session_instructors)
+        self.members = MemberView(gym.member_list, len(gym.member_list))
+        self.live_members = gym.members
+    
+    def keep_bill(self, period: str, member_id: str, bill: Optional[MemberBill]):
+        key = (period, member_id)
+        if key not in self.bills:
+            self.bills[key] = bill.copy() if bill is not None else None
+    
+    def keep_earnings(self, period: str, session_id: str, totals: Optional[list]):
+        key = (period, session_id)
+        if key not in self.earnings:
+            self.earnings[key] = list(totals) if totals is not None else None
+    
+    def keep_payroll(self, period: str, instructor_id: str, totals: Optional[list]):
+        key = (period, instructor_id)
+        if key not in self.payroll:
+            self.payroll[key] = list(totals) if totals is not None else None
+    
+    def bill(self, member_id: str, period: str) -> Optional[MemberBill]:
+        # the live entry is read first; if a writer got to it since, the copy it kept is there by now
+        live = self.ledger.bill(member_id, period)
+        current = live.copy() if live is not None else None
+        kept = self.bills.get((period, member_id), _UNCHANGED)
+        return current if kept is _UNCHANGED else kept
+    
+    def get_member_bill(self, member_id: str, period: Optional[str] = None) -> Optional[dict]:
+        # same as GymOnTheRock.get_member_bill with the bill as it was; looked up by id, a member who
+        # joined after the view was opened is still found (with no sessions), only iteration skips them
+        member = self.live_members.get(member_id)
+        if member is None:
+            return None
+        period = period or current_period()
+        return bill_summary(member_id, period, self.membership_plans[member.membership_type],
+                            self.bill(member_id, period))
+    
+    def session_totals(self, period: str) -> Dict[str, list]: #session_id -> [registrations, earnings]
+        live = self.live_earnings.totals(period)
+        totals = {}
+        for sid in self.sessions:
+            current = live.get(sid)
+            current = list(current) if current is not None else None
+            kept = self.earnings.get((period, sid), _UNCHANGED)
+            if kept is not _UNCHANGED:
+                current = kept
+            if current is not None:
+                totals[sid] = current
+        return totals
+    
+    def instructor_totals(self, period: str) -> Dict[str, list]: #instructor_id or "" -> [registrations, earned]
+        live = self.live_earnings.instructor_totals(period)
+        totals = {}
+        for iid in set(live) | {iid for kept_period, iid in self.payroll if kept_period == period}:
+            current = live.get(iid)
+            current = list(current) if current is not None else None
+            kept = self.payroll.get((period, iid), _UNCHANGED)
+            if kept is not _UNCHANGED:
+                current = kept
+            if current is not None:
+                totals[iid] = current
+        return totals
+    
+    def session_teachers(self, period: str) -> Dict[str, List[str]]: #session_id -> who taught it during the month
+        start, end = period_bounds(period)
+        return {sid: teachers_between(self.assignments, sid, start, end) for sid in self.sessions}
+    
+    def close(self):
+        with self.view_lock:
+            self.ledger.views = tuple(view for view in self.ledger.views if view is not self)
+            self.live_earnings.views = tuple(view for view in self.live_earnings.views if view is not self)
+
+class GymOnTheRock:
+    def __init__(self, storage: Optional[Storage] = None, metrics: Optional[Metrics] = None):
+        self.metrics = metrics or Metrics()  # off unless asked for, see metrics.py
         self.users = {}  # username -> User object
         self.members = {}  # member_id -> Member object
+        self.member_list = []  # the same members in the order they joined, append-only so StateViews can cut it
         self.sessions = {}  # session_id -> Session object
-        self.check_ins = []  # List of CheckIn objects
-        self.instructors = []  # List of Instructor objects
-        self.login_attempts = {}  # username -> {attempts, lockout_time}
+        self.check_ins = PartitionedCheckIns(self._session_registered)  # compact monthly columns, read as CheckIn views
+        self.instructors = {}  # instructor_id -> Instructor object
+        self.session_instructors = {}  # session_id -> instructor_id of whoever teaches it
+        self.ledger = BillingLedger()  # month -> member_id -> running bill
+        self.earnings = SessionEarnings()  # price history, and month -> session -> registrations and earnings
+        self.view_lock = threading.Lock()  # held by writers changing the ledger and earnings, and by views opening
+        self.member_index = MemberSearchIndex()  # name, phone and id lookups
+        self.ids = {name: IdAllocator(prefix, width, lambda limit, name=name: self._ids_reserved(name, limit))
+                    for name, prefix, width in (("member", "M", 4), ("session", "S", 2), ("instructor", "I", 3))}
+        self.login_attempts = LockoutTable()  # username -> {attempts, lockout_time}, stale entries evicted
+        self.auth_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="auth")  # password hashing is slow
         self.current_user = None
         self.membership_plans = {  #give you the benefits you get from the different plans you might sign up to
             "Platinum": MembershipPlan(10000, 4, 0.15),
@@ -70,16 +509,182 @@ class GymOnTheRock:
             "Standard": MembershipPlan(2000, 0, 0)
         }
         
-        # Initialize with some sample data
-        self._initialize_sample_data()
+        # Load saved state if there is any, otherwise start from the sample data
+        self.storage = None
+        self._batch_events = None  # changes held back while a batch is open, see batch()
+        if storage is not None:
+            state, events = storage.load()
+            if state is not None:
+                self._restore(state)
+            for kind, record in events:
+                self._apply(kind, record)
+            self.storage = storage
+            if state is None and not events:
+                self._initialize_sample_data()
+        else:
+            self._initialize_sample_data()
     
     def _initialize_sample_data(self):
         # Add a sample user
-        self.users["username"] = User("username", "username123")
+        self._store_user(User("username", hash_password("username123")))
         
         # Add sample sessions
-        self.sessions["S01"] = Session("S01", "MA Classes", 1100, "Evening")
-        self.sessions["S02"] = Session("S02", "Spin Classes", 900, "Morning")
+        self._store_session(Session("S01", "MA Classes", 1100, "Evening"))
+        self._store_session(Session("S02", "Spin Classes", 900, "Morning"))
+    
+    def _persist(self, kind: str, record: dict):
+        # every change is written to storage before it's applied in memory; the log is
+        # compacted first when it gets long, so the snapshot holds exactly the events logged so far
+        if self.storage is None:
+            return
+        if self._batch_events is not None:
+            self._batch_events.append((kind, record))
+            return
+        if self.storage.needs_snapshot():
+            self.storage.compact(self.export_state)  # WALStorage writes it from a forked copy, off this thread
+        self.storage.append(kind, record)
+    
+    @contextmanager
+    def batch(self):
+        # everything changed inside the with-block is saved as one atomic write when it ends
+        self._batch_events = []
+        try:
+            yield
+        finally:
+            events, self._batch_events = self._batch_events, None
+        if events and self.storage is not None:
+            # memory already holds the batch, so it's logged before any snapshot is taken
+            self.storage.append_batch(events)
+            if self.storage.needs_snapshot():
+                self.storage.compact(self.export_state)
+    
+    def export_state(self) -> dict: #everything needed to rebuild the gym, in a compact json-friendly form
+        columns = self.check_ins.to_columns()
+        runs = self.check_ins.archived_runs()
+        return {
+            "users": [[u.username, u.password_hash] for u in self.users.values()],
+            "user_members": [[username, member_id] for username, member_id in self.member_index.users.items()],
+            "members": [[m.member_id, m.first_name, m.last_name, m.contact, m.membership_type, m.date]
+                        for m in self.members.values()],
+            "sessions": [[s.session_id, s.name, s.cost, s.schedule] for s in self.sessions.values()],
+            "instructors": [[i.instructor_id, i.first_name, i.last_name] for i in self.instructors.values()],
+            "assignments": [[sid, effective, iid] for sid, (times, instructors) in self.earnings.assignments.items()
+                            for effective, iid in zip(times, instructors)],
+            "ids": {name: [ids.limit, ids.saved_next] for name, ids in self.ids.items()},
+            "prices": {sid: [list(change) for change in zip(times, costs)]
+                       for sid, (times, costs) in self.earnings.prices.items()},
+            # archived months keep their rows on disk; the snapshot holds where they are
+            "archived": [{"period": period, "path": path, "runs": runs[period]}
+                         for period, path in self.check_ins.archived.items()],
+            # every month's bills and session totals, so a restart loads the check-ins without replaying them
+            "bills": {period: self.ledger.closed_bills(period) for period in self.ledger.periods},
+            "session_totals": {period: self.earnings.totals(period) for period in self.earnings.periods},
+            "instructor_totals": {period: self.earnings.instructor_totals(period)
+                                  for period in self.earnings.instructor_periods},
+            "check_ins": {"member_id": columns["member_id"], "timestamp": columns["timestamp"]},
+            # in the order they were made, which decides which sessions fall inside a plan's allowance
+            "registrations": {"checkin": columns["registration_checkin"], "session_id": columns["registration_session"]},
+        }
+    
+    def _restore(self, state: dict):
+        for name, saved in state.get("ids", {}).items():
+            # [limit, next number]; older snapshots hold just the limit
+            limit, next_number = saved if isinstance(saved, list) else (saved, None)
+            self.ids[name].restore(limit, next_number)
+        for username, password_hash in state["users"]:
+            self._store_user(User(username, password_hash))
+        for row in state["members"]:
+            self._store_member(Member(*row))
+        for username, member_id in state.get("user_members", []):
+            self._link_user(username, member_id)
+        # price history goes in before the sessions so their current price isn't taken as a change made today
+        for sid, changes in state.get("prices", {}).items():
+            for effective, cost in changes:
+                self.earnings.set_price(sid, cost, effective)
+        for row in state["sessions"]:
+            self._store_session(Session(*row))
+        for row in state["instructors"]:
+            self._store_instructor(Instructor(*row))
+        for row in state.get("assignments", []):
+            # [session, effective, instructor]; older states have [session, instructor], taught all along
+            session_id, effective, instructor_id = row if len(row) == 3 else (row[0], 0.0, row[1])
+            self._assign_session(session_id, instructor_id, effective)
+        for month in state.get("archived", []):
+            self.check_ins.restore_archived(month["period"], month["path"], month["runs"])
+        # states without the month totals (sqlite with check-ins it hadn't totalled yet, or saved before
+        # payroll was totalled) have them rebuilt
+        totalled = "bills" in state and "instructor_totals" in state
+        if totalled:
+            for period, bills in state["bills"].items():
+                self.ledger.restore_bills(period, bills)
+            for period, totals in state["session_totals"].items():
+                self.earnings.restore_totals(period, totals)
+            for period, totals in state["instructor_totals"].items():
+                self.earnings.restore_instructor_totals(period, totals)
+        # check-ins are loaded as whole columns rather than through _record_checkin, they're the bulk of the snapshot
+        check_ins, registrations = state["check_ins"], state["registrations"]
+        self._load_checkins(check_ins["member_id"], check_ins["timestamp"],
+                            registrations["checkin"], registrations["session_id"], totalled)
+    
+    def _load_checkins(self, member_ids: List[str], timestamps: List[float],
+                       registration_checkins: List[int], registration_sessions: List[str], totalled: bool = False):
+        # bulk load of check-in columns (registration_checkins count from the first row given here);
+        # unless their totals came with them, the ledger and session earnings are fed straight from the
+        # columns. Nothing is written to storage
+        start = time.perf_counter()
+        self.check_ins.extend(member_ids, timestamps, registration_checkins, registration_sessions)
+        if not totalled:
+            record_session = self.ledger.record_session
+            record_earnings = self.earnings.record
+            with self.view_lock:
+                for checkin, session_id in zip(registration_checkins, registration_sessions):
+                    timestamp = timestamps[checkin]
+                    period = period_of(timestamp)
+                    record_session(member_ids[checkin], session_id, period,
+                                   record_earnings(session_id, period, timestamp))
+        if self.metrics.enabled:
+            self.metrics.observe("load_checkins", time.perf_counter() - start, len(member_ids))
+    
+    def _apply(self, kind: str, record: dict): #replays one logged change
+        if kind == "user":
+            self._store_user(User(record["username"], record["password_hash"]))
+        elif kind == "member":
+            self._store_member(Member(record["member_id"], record["first_name"], record["last_name"],
+                                      record["contact"], record["membership_type"], record["date"]))
+        elif kind == "session":
+            self._store_session(Session(record["session_id"], record["name"], record["cost"], record["schedule"]),
+                                record.get("effective", 0.0))
+        elif kind == "instructor":
+            self._store_instructor(Instructor(record["instructor_id"], record["first_name"], record["last_name"]))
+        elif kind == "checkin":
+            self._record_checkin(record["member_id"], datetime.fromtimestamp(record["timestamp"]))
+        elif kind == "checkin_session":
+            self.check_ins.add_session(record["checkin"], record["session_id"])
+        elif kind == "ids":
+            self.ids[record["name"]].restore(record["limit"], record.get("next"))
+        elif kind == "assignment":
+            self._assign_session(record["session_id"], record["instructor_id"], record.get("effective", 0.0))
+        elif kind == "user_member":
+            self._link_user(record["username"], record["member_id"])
+    
+    def close(self, snapshot: bool = True):
+        # leave a fresh snapshot behind so the next start has no log to replay; short batch runs skip it,
+        # everything they changed is in the log already
+        if self.storage is not None:
+            # the exact next ids, so a clean restart carries on where this run stopped (a crash skips to the limit)
+            issued = [(name, ids) for name, ids in self.ids.items() if ids.issued]
+            if issued:
+                with self.batch():
+                    for name, ids in issued:
+                        self._persist("ids", {"name": name, "limit": ids.limit, "next": ids.next_number})
+                for name, ids in issued:
+                    ids.saved()
+            if snapshot:
+                self.storage.snapshot(self.export_state())
+            self.storage.close()
+            self.storage = None
+        if self.metrics.path:
+            self.metrics.write()
     
     def signup(self) -> bool:
         print("\n [+]Welcome to Gym-On-The-Rock Sign Up ")
@@ -108,70 +713,178 @@ class GymOnTheRock:
             print("[+]Error 1005: pass must contain one special char")
             return False
         
-        # Add new user
-        self.users[username] = User(username, password)
+        # Add new user; tying the login to a membership is left to staff (add_member), who can check who they are
+        user = User(username, hash_password(password))
+        self._store_user(user)
         print("[+]Great, let's start your fitness journey")
         return True
     
+    def check_credentials(self, username: str, password: str) -> Future:
+        # hashing runs on the auth pool so several kiosks can log in at once; resolves to True/False
+        user = self.users.get(username)
+        if user is None:
+            return self.auth_pool.submit(lambda: verify_password(password, _dummy_hash()) and False)
+        return self.auth_pool.submit(verify_password, password, user.password_hash)
+    
     def login(self) -> bool: #this function allow it that after three attempts it locks you out for five minutes
-        max_attempts = 3
-        lockout_duration = timedelta(minutes=5)
+        max_attempts = self.login_attempts.max_attempts
         
         while True: #promts user for user name and password and store it in variables
             print("[+]Start on your fitness journey, Login")
             username = input("[+]Enter username: ").strip()
             password = input("[+]Enter password: ").strip()
             
-            if username not in self.login_attempts: #checks username
-                self.login_attempts[username] = {"attempts": 0, "lockout_time": None}
-            
-            user_data = self.login_attempts[username]
-            
-            if user_data["lockout_time"]:
-                if datetime.now() < user_data["lockout_time"]:
-                    remaining_lockout = user_data["lockout_time"] - datetime.now()
-                    print(f"Account locked. Try again in {remaining_lockout.seconds // 60} minutes and {remaining_lockout.seconds % 60} seconds.")#shows how much time left in your lock out if you get it wrong
-                    continue
-                else:
-                    # Reset lockout after duration has passed
-                    user_data["attempts"] = 0
-                    user_data["lockout_time"] = None
+            remaining_lockout = self.login_attempts.locked_for(username)
+            if remaining_lockout:
+                print(f"Account locked. Try again in {remaining_lockout.seconds // 60} minutes and {remaining_lockout.seconds % 60} seconds.")#shows how much time left in your lock out if you get it wrong
+                continue
             
             # Validate credentials
-            if username in self.users and self.users[username].password == password:
+            if self.check_credentials(username, password).result():
                 print("[+]login attempt successful")
                 # Reset attempt counter on successful login
-                user_data["attempts"] = 0
+                self.login_attempts.record_success(username)
                 self.current_user = username
                 return True
             else:
-                user_data["attempts"] += 1
-                attempts_left = max_attempts - user_data["attempts"]
+                attempts = self.login_attempts.record_failure(username)
+                attempts_left = max_attempts - attempts
                 print(f"[+]Your credentials are invalid, {attempts_left} attempts remaining.")
                 
-                if user_data["attempts"] >= max_attempts:
+                if attempts >= max_attempts:
                     print("[+]Too many failed attempts. The system will logout.")
                     return False
     
+    def _store_user(self, user: User):
+        self._persist("user", {"username": user.username, "password_hash": user.password_hash})
+        self.users[user.username] = user
+    
+    def _link_user(self, username: str, member_id: str): #the member a login belongs to
+        self._persist("user_member", {"username": username, "member_id": member_id})
+        self.member_index.link_user(username, member_id)
+    
+    def _store_member(self, member: Member):
+        # every new member goes through here so the ledger always has an account for them
+        self._persist("member", {"member_id": member.member_id, "first_name": member.first_name,
+                                 "last_name": member.last_name, "contact": member.contact,
+                                 "membership_type": member.membership_type, "date": member.date})
+        if member.member_id not in self.members:
+            self.member_list.append(member)
+        self.members[member.member_id] = member
+        self.ids["member"].observe(member.member_id)
+        self.ledger.open_account(member.member_id, self.membership_plans[member.membership_type])
+        self.member_index.add(member)
+    
+    def find_members(self, query: str, limit: int = 10) -> List[Member]: #type-ahead search by id, name or phone prefix
+        return [self.members[mid] for mid in self.member_index.search(query, limit)]
+    
+    def _store_session(self, session: Session, effective: Optional[float] = None): #used for new sessions and for updates
+        # a new cost applies to registrations from `effective` (now by default) on; earlier ones keep their price
+        effective = time.time() if effective is None else effective
+        self._persist("session", {"session_id": session.session_id, "name": session.name,
+                                  "cost": session.cost, "schedule": session.schedule, "effective": effective})
+        self.sessions[session.session_id] = session
+        self.ids["session"].observe(session.session_id)
+        self.earnings.set_price(session.session_id, session.cost, effective)
+    
+    def _store_instructor(self, instructor: Instructor):
+        self._persist("instructor", {"instructor_id": instructor.instructor_id,
+                                     "first_name": instructor.first_name, "last_name": instructor.last_name})
+        existing = self.instructors.get(instructor.instructor_id)
+        if existing is not None:  # an update keeps the sessions they teach
+            instructor.sessions = existing.sessions
+        self.instructors[instructor.instructor_id] = instructor
+        self.ids["instructor"].observe(instructor.instructor_id)
+    
+    def _assign_session(self, session_id: str, instructor_id: str, effective: Optional[float] = None):
+        # one instructor per session at a time; a new one takes over registrations from `effective` (now by
+        # default) on, so payroll for earlier months stays with whoever taught them
+        effective = time.time() if effective is None else effective
+        self._persist("assignment", {"session_id": session_id, "instructor_id": instructor_id, "effective": effective})
+        previous = self.session_instructors.get(session_id)
+        if previous in self.instructors:
+            self.instructors[previous].sessions.remove(session_id)
+        self.session_instructors[session_id] = instructor_id
+        self.instructors[instructor_id].sessions.append(session_id)
+        with self.view_lock:  # views copy the history when they open
+            self.earnings.assign(session_id, instructor_id, effective)
+    
+    def _record_checkin(self, member_id: str, timestamp: datetime) -> CheckIn:
+        self._persist("checkin", {"checkin": len(self.check_ins), "member_id": member_id,
+                                  "timestamp": timestamp.timestamp()})
+        return self.check_ins.append(member_id, timestamp)
+    
+    def _session_registered(self, checkin: CheckIn, session_id: str):
+        self._persist("checkin_session", {"checkin": checkin.index, "session_id": session_id})
+        timestamp = checkin.store.timestamp_of(checkin.index)
+        period = period_of(timestamp)
+        with self.view_lock:  # a view sees both changes or neither
+            price = self.earnings.record(session_id, period, timestamp)  # the price in effect when they checked in
+            self.ledger.record_session(checkin.member_id, session_id, period, price)
+    
+    def get_member_bill(self, member_id: str, period: Optional[str] = None) -> Optional[dict]:
+        # returns a member's fee for one month ("YYYY-MM", this month by default) without going through the menus
+        member = self.members.get(member_id)
+        if member is None:
+            return None
+        
+        period = period or current_period()
+        return bill_summary(member_id, period, self.membership_plans[member.membership_type],
+                            self.ledger.bill(member_id, period))
+    
+    def session_totals(self, period: str) -> Dict[str, list]: #session_id -> [registrations, earnings] for one month
+        return self.earnings.totals(period)
+    
+    def instructor_totals(self, period: str) -> Dict[str, list]: #instructor_id or "" -> [registrations, earned]
+        return self.earnings.instructor_totals(period)
+    
+    def session_teachers(self, period: str) -> Dict[str, List[str]]: #session_id -> who taught it during the month
+        start, end = period_bounds(period)
+        return {sid: teachers_between(self.earnings.assignments, sid, start, end) for sid in self.sessions}
+    
+    @contextmanager
+    def read_view(self):
+        # a consistent point-in-time view for reports and billing; check-ins can keep coming in meanwhile
+        view = StateView(self)
+        try:
+            yield view
+        finally:
+            view.close()
+    
+    def _ids_reserved(self, name: str, limit: int):
+        self._persist("ids", {"name": name, "limit": limit})
+    
     def generate_member_id(self) -> str:#gives you an id number
-        return f"M{len(self.members) + 1:04d}"
+        return self.ids["member"].next_id()
+    
+    def generate_session_id(self) -> str: #next session id, e.g. S03
+        return self.ids["session"].next_id()
+    
+    def generate_instructor_id(self) -> str:
+        return self.ids["instructor"].next_id()
+    
+    def archive_period(self, period: str, directory: str = "archive") -> str:
+        # moves a closed month's check-ins out of memory; bills for it stay available from the ledger
+        return self.check_ins.archive(period, directory)
+    
+    def allocate_member_ids(self, count: int) -> List[str]: #a run of ids for members that are about to be added together
+        ids = self.ids["member"]
+        return [ids.format(n) for n in ids.reserve(count)]
     
     def member_checkin(self) -> None:
         print("\n [+]Welcome to mem checkin :) ")
         
         while True:
-            mem_id = input("[+]Please enter your five-digit ID: ").strip().upper()#prompts user for id number
-            if re.match(r"^M\d{4}$", mem_id):
+            mem_id = input("[+]Please enter your member ID: ").strip().upper()#prompts user for id number
+            if MEMBER_ID_PATTERN.match(mem_id):
                 break
-            print("[+]Error 2020: ID must be 5 characters eg. M0007")
+            print("[+]Error 2020: ID must be M and 4 or more digits eg. M0007")
         
         if mem_id not in self.members: #checks for members id
             print("[+]Error 1006: Enter valid member ID")
             return
         
-        checkin_time = datetime.now()
-        new_checkin = CheckIn(mem_id, checkin_time)
-        self.check_ins.append(new_checkin)
+        new_checkin = self._record_checkin(mem_id, datetime.now())
         
         print(f"[+]Welcome {self.members[mem_id].first_name}") #welcome message for user
         print("[+]You have the following sessions available: ")
@@ -234,7 +947,16 @@ class GymOnTheRock:
             datetime.now().strftime("%Y-%m-%d")
         )
         
-        self.members[mem_id] = new_member
+        # staff can tie the member's login to the membership, so the menu shows their own sessions and bill
+        username = input("[+]Login to link to this member (or press Enter): ").strip()
+        if username and username not in self.users:
+            print("[+]Error 1007: no such login, the member is added without one")
+            username = ""
+        
+        with self.batch():
+            self._store_member(new_member)
+            if username:
+                self._link_user(username, mem_id)
         print(f"[+]You have successfully added member {mem_id}")
     
     def manage_sessions(self):
@@ -248,12 +970,7 @@ class GymOnTheRock:
         user_prompt = input("\n1. Enter 1 to add new \n2. Enter 2 to update existing sessions: ").strip()
         
         if user_prompt == "1":
-            # Generate new session ID
-            if self.sessions:
-                max_num = max(int(sid[1:]) for sid in self.sessions if sid.startswith("S") and sid[1:].isdigit())
-                session_id = f"S{max_num + 1:02d}"
-            else:
-                session_id = "S01"
+            session_id = self.generate_session_id()
             
             # Get session details
             name = input("[+]Session Name: ").strip()
@@ -262,7 +979,7 @@ class GymOnTheRock:
             
             # Create and store the new session
             new_session = Session(session_id, name, cost, schedule)
-            self.sessions[session_id] = new_session
+            self._store_session(new_session)
             print(f"[+]You have successfully added session {session_id}")
             
         elif user_prompt == "2":
@@ -276,120 +993,78 @@ class GymOnTheRock:
                 new_cost = int(input("[+]Your new cost is: $").strip())
                 new_schedule = input("[+]Your new schedule: ").strip().title()
                 
-                session.cost = new_cost
-                session.schedule = new_schedule
+                # a new Session rather than changing this one, so open report views keep the old one
+                self._store_session(Session(session_id, session.name, new_cost, new_schedule))
                 print("[+]Your session has been updated ")
             else:
                 print("Error 1010: Invalid session ID")
 
     # creates a report with useful information
-    def generate_reports(self):
-        print("[+]Welcome to Sys reports")
-        
-        # List all members
-        print("\n[+]List of all members and the total num of members:")
-        for mid, member in self.members.items():
-            print(f"[+]{mid}: {member.first_name} {member.last_name} ({member.membership_type})")
-        print(f"\nTotal number of members: {len(self.members)}")
-        
-        # List all sessions
-        print("\n[+]List of all classes and their schedule:")
-        for sid, session in self.sessions.items():
-            print(f"[+]{sid}: {session.name} - ${session.cost} ({session.schedule})")
-        
-        # Count members by type and calculate fees
-        membership_counts = {"Platinum": 0, "Diamond": 0, "Gold": 0, "Standard": 0}
-        membership_fees = {"Platinum": 0, "Diamond": 0, "Gold": 0, "Standard": 0}
-        
-        for member in self.members.values():
-            membership_type = member.membership_type
-            membership_counts[membership_type] += 1
-            membership_fees[membership_type] += self.membership_plans[membership_type].cost
+    def generate_reports(self, sinks: Optional[List[ReportSink]] = None, period: Optional[str] = None):
+        # each section is streamed row by row to the sinks; by default that's the console.
+        # fees and class earnings are for one billing month ("YYYY-MM"), this month by default
+        console = sinks is None
+        if console:
+            print("[+]Welcome to Sys reports")
+            sinks = [ConsoleSink()]
         
-        print("\n[+]List of members for each membership type and total fees:")
-        for membership_type, count in membership_counts.items():
-            print(f"[+]{membership_type}: {count} members, Total fees: ${membership_fees[membership_type]}")
+        # the report reads a point-in-time view, so the front desk can keep checking people in meanwhile
+        with self.read_view() as view:
+            write_report(view, sinks, period or current_period())
+            for sink in sinks:
+                sink.close()
+            sessions = view.sessions
         
-        # Calculate earnings per class
-        class_earnings = {sid: 0 for sid in self.sessions}
-        print("\n[+]List of members registered for classes && total earnings:")
-        
-        for checkin in self.check_ins:
-            for sid in checkin.sessions:
-                if sid in class_earnings:
-                    class_earnings[sid] += self.sessions[sid].cost
-        
-        for sid, earnings in class_earnings.items():
-            print(f"[+]{sid}: Total earnings: ${earnings}")
-        
-        # Calculate total monthly fee per member
-        print("\n[+]Report for each client with total monthly fee:")
-        
-        for mid, member in self.members.items():
-            membership_plan = self.membership_plans[member.membership_type]
-            membership_cost = membership_plan.cost
-            included_sessions = membership_plan.included_sessions
-            discount = membership_plan.discount
-            
-            # Get all sessions for this member
-            all_sessions = []
-            for checkin in self.check_ins:
-                if checkin.member_id == mid:
-                    all_sessions.extend(checkin.sessions)
-            
-            # Calculate additional session costs
-            session_cost = 0
-            if len(all_sessions) > included_sessions:
-                paid_sessions = all_sessions[included_sessions:]
-                for sid in paid_sessions:
-                    if sid in self.sessions:
-                        session_cost += self.sessions[sid].cost * (1 - discount)
-            
-            member_total = membership_cost + session_cost
-            print(f"[+]{mid}: {member.first_name} {member.last_name}, Contact: {member.contact}, "
-                  f"Membership Type: {member.membership_type}, Total monthly fee: ${member_total}")
+        if not console:
+            return
         
         # List available sessions
         print("\n[+]You have the following existing sessions:")
-        for sid, session in self.sessions.items():
+        for sid, session in sessions.items():
             print(f"[+][{sid}] {session.name} (${session.cost})")
     
     def add_instructor(self):
         print("\n[+]Add instructor ")
         
-        instructors_list = [
-            "Jaxon Steele",
-            "Blake Titan",
-            "Ryder Knox",
-            "Logan Vega",
-            "Dante Storm",
-        ]
-        
-        print("[+]Available instructors:")
-        for i, name in enumerate(instructors_list, 1):
-            print(f"{i}. {name}")
+        if self.instructors:
+            print("[+]Current instructors:")
+            for iid, instructor in self.instructors.items():
+                print(f"[+][{iid}] {instructor.get_full_name()} ({', '.join(instructor.sessions) or 'no sessions'})")
         
-        # Get instructor choice
+        # Get the instructor's name
         while True:
-            try:
-                choice = int(input("[+]Select your instructor (1-5): "))
-                if 1 <= choice <= 5:
-                    break
-            except:
-                pass
-            print("[+]Invalid choice.")
-        
-        selected = instructors_list[choice - 1]
-        first, last = selected.split()
+            first = input("[+]Enter the instructor's first name: ").strip()
+            if first.isalpha():
+                break
+            print("[+]Error 1008: invalid name, use alpha char only")
+        last = input("[+]Enter the instructor's last name: ").strip()
         
         # Generate instructor ID
-        instructor_id = f"I{len(self.instructors) + 1:03d}"
+        instructor_id = self.generate_instructor_id()
         
         # Create and store new instructor
         new_instructor = Instructor(instructor_id, first, last)
-        self.instructors.append(new_instructor)
+        self._store_instructor(new_instructor)
+        
+        print(f"[+]Instructor {instructor_id} added: {new_instructor.get_full_name()}")
+        
+        # Sessions they teach; a session that had an instructor moves over to this one
+        print("[+]You have the following sessions:")
+        for sid, session in self.sessions.items():
+            teacher = self.instructors.get(self.session_instructors.get(sid))
+            print(f"{sid} {session.name} ({session.schedule}) - {teacher.get_full_name() if teacher else 'no instructor'}")
         
-        print(f"[+]Instructor {instructor_id} added: {selected}")
+        while True:
+            usr_choice = input("[+]Enter a session ID this instructor teaches (when finished type F)").strip().upper()
+            
+            if usr_choice == "F":
+                break
+            
+            if usr_choice in self.sessions:
+                self._assign_session(usr_choice, instructor_id)
+                print(f"[+]{new_instructor.get_full_name()} now teaches {self.sessions[usr_choice].name}")
+            else:
+                print("Error 1010: Invalid session ID")
     
     def display_main_menu(self):
         # Display current user details if logged in
@@ -401,16 +1076,11 @@ class GymOnTheRock:
             total_cost = 0
             
             # Check if the current user is a member
-            member_id = None
-            for mid, member in self.members.items():
-                if member.first_name.lower() == self.current_user.lower():
-                    member_id = mid
-                    break
+            member_id = self.member_index.member_for_user(self.current_user)
             
             if member_id:
-                for checkin in self.check_ins:
-                    if checkin.member_id == member_id:
-                        user_sessions.extend(checkin.sessions)
+                # months moved out to archive files are closed and billed, they aren't read on every redraw
+                user_sessions = self.check_ins.member_sessions(member_id, archived=False)
                 
                 if user_sessions:
                     print("[+]Registered sessions:")
@@ -423,18 +1093,21 @@ class GymOnTheRock:
                 else:
                     print("[+]You are not registered for any sessions.")
         
-        # Create and display menu
+        # Create and display menu; consolemenu is only imported here so batch jobs never load it
+        from consolemenu import ConsoleMenu
+        from consolemenu.items import FunctionItem
         menu = ConsoleMenu(
             title="\033[36mGYM-ON-THE-ROCK\033[0m",
             subtitle="\033[32mBorn From The Fire Birthplace of Strength\033[0m",
         )
         
+        wrap = self.metrics.wrap  # timing and profiling per action, a no-op unless metrics are on
         items = [
-            FunctionItem("\033[33mMember Check-in\033[0m", self.member_checkin),
-            FunctionItem("\033[32mAdd A Member(s)\033[0m", self.add_member),
-            FunctionItem("\033[34mManage Your Sessions\033[0m", self.manage_sessions),
-            FunctionItem("\033[35mAdd an Instructor\033[0m", self.add_instructor),
-            FunctionItem("\033[36mGenerate Your Reports\033[0m", self.generate_reports),
+            FunctionItem("\033[33mMember Check-in\033[0m", wrap("member_checkin", self.member_checkin)),
+            FunctionItem("\033[32mAdd A Member(s)\033[0m", wrap("add_member", self.add_member)),
+            FunctionItem("\033[34mManage Your Sessions\033[0m", wrap("manage_sessions", self.manage_sessions)),
+            FunctionItem("\033[35mAdd an Instructor\033[0m", wrap("add_instructor", self.add_instructor)),
+            FunctionItem("\033[36mGenerate Your Reports\033[0m", wrap("generate_reports", self.generate_reports)),
         ]
         
         for item in items:
@@ -460,7 +1133,7 @@ class GymOnTheRock:
             while True:
                 user_prompt = input("[+]Are you a member? you can become a member by selecting 1. Signing up or 2. Login: ")
                 
-                if user_prompt == "2" and self.login():
+                if user_prompt == "2" and self.metrics.wrap("login", self.login)():
                     self.display_main_menu()
                     break
                 elif user_prompt == "1":
@@ -473,9 +1146,14 @@ class GymOnTheRock:
         except Exception as e:
             print(f"[+]An error occurred:(: {e}")
         finally:
+            self.close()
             print("[+]Have a nice day:)")
 
 # Main entry point
 if __name__ == "__main__":
-    gym = GymOnTheRock()
+    try:
+        storage = WALStorage("gym_data")
+    except StorageInUse as error:
+        sys.exit(str(error))
+    gym = GymOnTheRock(storage, Metrics.from_env())
     gym.run()
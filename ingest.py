@@ -0,0 +1,268 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from gym_oop import MEMBER_ID_PATTERN, GymOnTheRock, Member
+from storage import StorageInUse, open_storage
+
+# Bulk import of members and check-ins from CSV or JSON Lines files.
+# Rows are validated in chunks on a process pool with the same rules as the interactive
+# prompts, each valid chunk is committed in one atomic batch and rejected rows go to an
+# error report with the usual error codes.
+# Imported members get new ids from the gym. The id a member had in the file (its member_id
+# column) is mapped to the new one; the map is written out and check-in files that still use
+# the old ids are translated through it.
+
+# shared with the worker processes, filled in by _init_worker
+_plans = set()
+_members = set()
+_sessions = set()
+_id_map = {}  # member id in the imported files -> member id in the gym
+
+MEMBER_FIELDS = ("first_name", "last_name", "contact", "membership_type", "date")  # of a validated member row
+
+
+def read_rows(path: str) -> Iterator[Tuple[int, dict]]: #yields (line number, row) from a .csv or .jsonl file
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError:
+                        yield line_no, line.rstrip("\n")  # not json; rejected along with the other non-objects
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(plans, members, sessions, id_map):
+    global _plans, _members, _sessions, _id_map
+    _plans, _members, _sessions, _id_map = plans, members, sessions, id_map
+
+
+def _rejected(line_no: int, code: str, message: str, row: dict) -> dict:
+    return {"line": line_no, "error_code": code, "message": message, "row": json.dumps(row)}
+
+
+def _malformed(line_no: int, row, detail: str = "each line must be one json object") -> dict:
+    # rows that aren't a json object, or have fields of the wrong type, e.g. "sessions": [1]
+    return _rejected(line_no, "2022", detail, row)
+
+
+def validate_members(chunk: List[Tuple[int, dict]]) -> Tuple[list, list]:
+    # same rules as add_member: alphabetic first name and one of the membership types
+    valid, rejected = [], []
+    today = datetime.now().strftime("%Y-%m-%d")
+    for line_no, row in chunk:
+        if not isinstance(row, dict):
+            rejected.append(_malformed(line_no, row))
+            continue
+        first_name = str(row.get("first_name") or "").strip()
+        membership_type = str(row.get("membership_type") or "").strip().title()
+        if not first_name.isalpha():
+            rejected.append(_rejected(line_no, "1008", "invalid name, use alpha char only", row))
+        elif membership_type not in _plans:
+            rejected.append(_rejected(line_no, "1009", "please select one valid membership type", row))
+        else:
+            valid.append([line_no, str(row.get("member_id") or "").strip().upper(),
+                          [first_name, str(row.get("last_name") or "").strip(), str(row.get("contact") or ""),
+                           membership_type, str(row.get("date") or today)]])
+    return valid, rejected
+
+
+def validate_checkins(chunk: List[Tuple[int, dict]]) -> Tuple[list, list]:
+    # same rules as member_checkin: M0007-style id of an existing member, known session ids
+    valid, rejected = [], []
+    for line_no, row in chunk:
+        if not isinstance(row, dict):
+            rejected.append(_malformed(line_no, row))
+            continue
+        member_id = str(row.get("member_id") or "").strip().upper()
+        member_id = _id_map.get(member_id, member_id)
+        sessions = row.get("sessions") or []
+        if isinstance(sessions, str):  # csv files list sessions as "S01;S02"
+            sessions = [sid for sid in sessions.split(";") if sid.strip()]
+        if not isinstance(sessions, list) or not all(isinstance(sid, str) for sid in sessions):
+            rejected.append(_malformed(line_no, row, "sessions must be a list of session IDs"))
+            continue
+        sessions = [sid.strip().upper() for sid in sessions]
+        if not MEMBER_ID_PATTERN.match(member_id):
+            rejected.append(_rejected(line_no, "2020", "ID must be M and 4 or more digits eg. M0007", row))
+            continue
+        if member_id not in _members:
+            rejected.append(_rejected(line_no, "1006", "Enter valid member ID", row))
+            continue
+        bad_sessions = [sid for sid in sessions if sid not in _sessions]
+        if bad_sessions:
+            rejected.append(_rejected(line_no, "1010", f"Invalid session ID {', '.join(bad_sessions)}", row))
+            continue
+        try:
+            timestamp = datetime.fromisoformat(str(row.get("timestamp"))).timestamp()
+        except (ValueError, OverflowError, OSError):  # not a date, or one the platform can't convert
+            rejected.append(_rejected(line_no, "2021", "check-in time must be an ISO date and time", row))
+            continue
+        valid.append([member_id, timestamp, sessions])
+    return valid, rejected
+
+
+class ErrorReport: #rejected rows as csv, opened on the first rejection
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.file = None
+        self.writer = None
+        self.count = 0
+
+    def write(self, rejected: list):
+        self.count += len(rejected)
+        if not rejected or self.path is None:
+            return
+        if self.writer is None:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            self.writer = csv.DictWriter(self.file, fieldnames=["line", "error_code", "message", "row"])
+            self.writer.writeheader()
+        self.writer.writerows(rejected)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def read_id_map(path: str) -> Dict[str, str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["source_member_id"]: row["member_id"] for row in csv.DictReader(f)}
+
+
+def write_id_map(path: str, id_map: Dict[str, str]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["source_member_id", "member_id"])
+        writer.writerows(id_map.items())
+
+
+def _pool(gym: GymOnTheRock, workers: Optional[int], id_map: Optional[Dict[str, str]] = None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(set(gym.membership_plans), set(gym.members), set(gym.sessions),
+                                         id_map or {}))
+
+
+def _validated(pool: ProcessPoolExecutor, validate: Callable, chunks: Iterable[list],
+               workers: Optional[int]) -> Iterator[Tuple[list, list]]:
+    # like pool.map, in file order, but only a couple of chunks per worker are read and in flight
+    # at a time, so a year of door logs is never all in memory
+    ahead = 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(validate, chunk))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def import_members(gym: GymOnTheRock, path: str, errors: ErrorReport, chunk_size: int = 5000,
+                   workers: Optional[int] = None, id_map: Optional[Dict[str, str]] = None) -> int:
+    # id_map, when given, is filled in with each row's member_id in the file -> the id it was given here
+    added = 0
+    id_map = {} if id_map is None else id_map
+    seen = set(id_map)
+    with _pool(gym, workers) as pool:
+        for valid, rejected in _validated(pool, validate_members, chunked(read_rows(path), chunk_size), workers):
+            new_members = []
+            for line_no, source_id, row in valid:
+                # the same old id twice would leave its check-ins with two members to go to
+                if source_id in seen:
+                    rejected.append(_rejected(line_no, "2023", f"member ID {source_id} is already in the file",
+                                              {"member_id": source_id, **dict(zip(MEMBER_FIELDS, row))}))
+                    continue
+                if source_id:
+                    seen.add(source_id)
+                new_members.append((source_id, row))
+            errors.write(sorted(rejected, key=lambda entry: entry["line"]))
+            with gym.batch():
+                for member_id, (source_id, row) in zip(gym.allocate_member_ids(len(new_members)), new_members):
+                    gym._store_member(Member(member_id, *row))
+                    if source_id:
+                        id_map[source_id] = member_id
+            added += len(new_members)
+    return added
+
+
+def import_checkins(gym: GymOnTheRock, path: str, errors: ErrorReport, chunk_size: int = 20000,
+                    workers: Optional[int] = None, id_map: Optional[Dict[str, str]] = None) -> int:
+    # member ids found in id_map (see import_members) are translated before the rows are checked
+    added = 0
+    with _pool(gym, workers, id_map) as pool:
+        for valid, rejected in _validated(pool, validate_checkins, chunked(read_rows(path), chunk_size), workers):
+            errors.write(rejected)
+            with gym.batch():
+                for member_id, timestamp, sessions in valid:
+                    checkin = gym._record_checkin(member_id, datetime.fromtimestamp(timestamp))
+                    for sid in sessions:
+                        checkin.add_session(sid)
+            added += len(valid)
+    return added
+
+
+ID_MAP_PATH = "member_id_map.csv"
+
+
+def run_imports(gym: GymOnTheRock, args, errors: ErrorReport):
+    # members first, so check-ins in the same run can use the ids they were just given
+    id_map = {}
+    if args.members:
+        print(f"[+]Imported {import_members(gym, args.members, errors, workers=args.workers, id_map=id_map)} members")
+        if id_map:
+            write_id_map(args.id_map or ID_MAP_PATH, id_map)
+            print(f"[+]Old to new member IDs written to {args.id_map or ID_MAP_PATH}")
+    elif args.id_map and args.checkins:
+        id_map = read_id_map(args.id_map)
+    if args.checkins:
+        added = import_checkins(gym, args.checkins, errors, workers=args.workers, id_map=id_map)
+        print(f"[+]Imported {added} check-ins")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import members and check-ins into Gym-On-The-Rock")
+    parser.add_argument("--data", default="gym_data", help="storage location (a directory, or a .db file for sqlite)")
+    parser.add_argument("--members", help="members file (.csv or .jsonl)")
+    parser.add_argument("--checkins", help="check-ins file (.csv or .jsonl)")
+    parser.add_argument("--errors", default="import_errors.csv", help="where rejected rows are written")
+    parser.add_argument("--workers", type=int, help="validation processes (default: one per cpu)")
+    parser.add_argument("--id-map", help=f"old -> new member ids: written by a members import "
+                        f"(default {ID_MAP_PATH}), read by a check-ins import")
+    args = parser.parse_args()
+
+    try:
+        storage = open_storage(args.data)
+    except StorageInUse as error:
+        sys.exit(str(error))
+    gym = GymOnTheRock(storage)
+    errors = ErrorReport(args.errors)
+    try:
+        run_imports(gym, args, errors)
+    finally:
+        errors.close()
+        gym.close()
+    if errors.count:
+        print(f"[+]{errors.count} rows rejected, see {args.errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Optional
+
+# Load test for the front desk service: many kiosks checking members in at once.
+# Each kiosk checks a member in and registers them for a session, over and over.
+# With --local a server is started in this process on a synthetic gym.
+
+
+async def kiosk(host: str, port: int, path: Optional[str], member_ids: List[str], session_ids: List[str],
+                checkins: int, latencies: List[float], seed: int):
+    rng = random.Random(seed)
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def call(request: dict) -> dict:
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        return response
+
+    for _ in range(checkins):
+        response = await call({"op": "checkin", "member_id": rng.choice(member_ids)})
+        if response["ok"]:
+            await call({"op": "register", "checkin": response["checkin"], "session_id": rng.choice(session_ids)})
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args):
+    server = None
+    if args.local:
+        from bench_billing import build_gym
+        from service import FrontDeskService
+        service = FrontDeskService(build_gym(args.members, 0))
+        server = await service.start(args.host, args.port, args.unix)
+        member_ids = list(service.gym.members)
+        session_ids = list(service.gym.sessions)
+    else:
+        member_ids = [f"M{n:04d}" for n in range(1, args.members + 1)]
+        session_ids = ["S01", "S02"]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(kiosk(args.host, args.port, args.unix, member_ids, session_ids,
+                                 args.checkins, latencies, seed) for seed in range(args.kiosks)))
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+    total = args.kiosks * args.checkins
+    print(f"[+]{args.kiosks} kiosks, {total} check-ins in {elapsed:.2f}s")
+    print(f"[+]Check-ins per second: {total / elapsed:.0f}")
+    print(f"[+]Request latency p50: {percentile(latencies, 50) * 1000:.2f}ms, "
+          f"p99: {percentile(latencies, 99) * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Gym-On-The-Rock front desk service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this unix socket path instead of tcp")
+    parser.add_argument("--kiosks", type=int, default=20, help="concurrent connections")
+    parser.add_argument("--checkins", type=int, default=500, help="check-ins per kiosk")
+    parser.add_argument("--members", type=int, default=1000, help="members to pick from (M0001 upwards)")
+    parser.add_argument("--local", action="store_true", help="start a server in this process on a synthetic gym")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
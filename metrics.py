@@ -0,0 +1,111 @@
+import cProfile
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+# Call counts, latency histograms and record counts for the menu actions and the hot loops
+# behind them, written out in the Prometheus text format. Disabled metrics hand back the
+# original functions unwrapped, and the loops only look at `enabled` once per pass.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # seconds
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False, path: Optional[str] = None, profile_dir: Optional[str] = None):
+        self.enabled = enabled or bool(path or profile_dir)
+        self.path = path  # where write() puts the Prometheus text
+        self.profile_dir = profile_dir  # one cProfile dump per action call when set
+        self.calls = {}  # action -> times called
+        self.errors = {}  # action -> calls that raised
+        self.records = {}  # action -> records processed
+        self.latency: Dict[str, Histogram] = {}
+        self.lock = threading.Lock()  # the service and the auth pool record from other threads
+
+    @classmethod
+    def from_env(cls) -> "Metrics": #GYM_METRICS=metrics.prom and/or GYM_PROFILE=profiles/ turn it on
+        return cls(path=os.environ.get("GYM_METRICS"), profile_dir=os.environ.get("GYM_PROFILE"))
+
+    def observe(self, action: str, seconds: float, records: int = 0, failed: bool = False):
+        with self.lock:
+            self.calls[action] = self.calls.get(action, 0) + 1
+            if failed:
+                self.errors[action] = self.errors.get(action, 0) + 1
+            if records:
+                self.records[action] = self.records.get(action, 0) + records
+            histogram = self.latency.get(action)
+            if histogram is None:
+                histogram = self.latency[action] = Histogram()
+            histogram.observe(seconds)
+
+    def wrap(self, action: str, func: Callable) -> Callable:
+        # times every call of func (and profiles it if asked); with metrics off func comes back as it is
+        if not self.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = cProfile.Profile() if self.profile_dir else None
+            failed = True
+            start = time.perf_counter()
+            try:
+                if profiler is not None:
+                    result = profiler.runcall(func, *args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe(action, time.perf_counter() - start, failed=failed)
+                if profiler is not None:
+                    self._dump_profile(action, profiler)
+        return wrapper
+
+    def _dump_profile(self, action: str, profiler: cProfile.Profile):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.profile_dir, f"{action}-{self.calls[action]:04d}.prof"))
+
+    def to_prometheus(self) -> str:
+        with self.lock:
+            lines = ["# HELP gym_action_calls_total Calls of each menu action or hot loop.",
+                     "# TYPE gym_action_calls_total counter"]
+            lines += [f'gym_action_calls_total{{action="{action}"}} {count}' for action, count in self.calls.items()]
+            lines += ["# HELP gym_action_errors_total Calls that raised an exception.",
+                      "# TYPE gym_action_errors_total counter"]
+            lines += [f'gym_action_errors_total{{action="{action}"}} {count}' for action, count in self.errors.items()]
+            lines += ["# HELP gym_action_records_total Records processed (rows, check-ins, members).",
+                      "# TYPE gym_action_records_total counter"]
+            lines += [f'gym_action_records_total{{action="{action}"}} {count}' for action, count in self.records.items()]
+            lines += ["# HELP gym_action_seconds Time taken per call.", "# TYPE gym_action_seconds histogram"]
+            for action, histogram in self.latency.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'gym_action_seconds_bucket{{action="{action}",le="{bound}"}} {cumulative}')
+                lines.append(f'gym_action_seconds_sum{{action="{action}"}} {histogram.total:.6f}')
+                lines.append(f'gym_action_seconds_count{{action="{action}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Optional[str] = None):
+        # written to a temp file and renamed, so a scraper reading the file never sees half of it
+        path = path or self.path
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp, path)
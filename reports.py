@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+import time
+from typing import Iterator, List, TextIO
+
+# Each report section is a generator of plain dict rows, so a sink sees one row at a time
+# and nothing is held in memory beyond the row being written. Sections that depend on time
+# (class earnings, monthly fees) cover one billing period, "YYYY-MM". `gym` is normally a
+# StateView from GymOnTheRock.read_view(), though a GymOnTheRock itself works as well.
+
+
+def member_rows(gym, period: str) -> Iterator[dict]:
+    for mid, member in gym.members.items():
+        yield {"member_id": mid, "first_name": member.first_name, "last_name": member.last_name,
+               "membership_type": member.membership_type}
+
+
+def session_rows(gym, period: str) -> Iterator[dict]:
+    for sid, session in gym.sessions.items():
+        yield {"session_id": sid, "name": session.name, "cost": session.cost, "schedule": session.schedule}
+
+
+def membership_rows(gym, period: str) -> Iterator[dict]:
+    # Count members by type and calculate fees
+    membership_counts = {membership_type: 0 for membership_type in gym.membership_plans}
+    membership_fees = {membership_type: 0 for membership_type in gym.membership_plans}
+    for member in gym.members.values():
+        membership_type = member.membership_type
+        membership_counts[membership_type] += 1
+        membership_fees[membership_type] += gym.membership_plans[membership_type].cost
+    for membership_type, count in membership_counts.items():
+        yield {"membership_type": membership_type, "members": count, "total_fees": membership_fees[membership_type]}
+
+
+def class_earnings_rows(gym, period: str) -> Iterator[dict]:
+    # kept up to date on every registration, priced at the rate in effect then, so this is one row per session
+    totals = gym.session_totals(period)
+    for sid in gym.sessions:
+        yield {"session_id": sid, "total_earnings": totals[sid][1] if sid in totals else 0}
+
+
+def monthly_fee_rows(gym, period: str) -> Iterator[dict]:
+    for mid, member in gym.members.items():
+        yield {"member_id": mid, "first_name": member.first_name, "last_name": member.last_name,
+               "contact": member.contact, "membership_type": member.membership_type,
+               "total_monthly_fee": gym.get_member_bill(mid, period)["total"]}
+
+
+def payroll_rows(gym, period: str) -> Iterator[dict]:
+    # registrations and earnings are totalled per instructor as they happen, credited to whoever taught
+    # the class at the time, so a later reassignment doesn't move them and the check-ins are never read
+    payroll = {iid: [0, 0, 0] for iid in gym.instructors}  # classes taught, registrations, revenue
+    unassigned = [0, 0, 0]
+    for teachers in gym.session_teachers(period).values():
+        for iid in teachers:
+            payroll.get(iid, unassigned)[0] += 1
+    for iid, (registrations, earned) in gym.instructor_totals(period).items():
+        row = payroll.get(iid, unassigned)
+        row[1] += registrations
+        row[2] += earned
+    for iid, (classes, registrations, revenue) in payroll.items():
+        yield {"instructor_id": iid, "name": gym.instructors[iid].get_full_name(), "classes": classes,
+               "registrations": registrations, "revenue": revenue}
+    if unassigned[0] or unassigned[1]:
+        yield {"instructor_id": "", "name": "No instructor", "classes": unassigned[0],
+               "registrations": unassigned[1], "revenue": unassigned[2]}
+
+
+SECTIONS = [  # (section, the fields of its rows, row generator)
+    ("members", ["member_id", "first_name", "last_name", "membership_type"], member_rows),
+    ("sessions", ["session_id", "name", "cost", "schedule"], session_rows),
+    ("memberships", ["membership_type", "members", "total_fees"], membership_rows),
+    ("class_earnings", ["session_id", "total_earnings"], class_earnings_rows),
+    ("monthly_fees", ["member_id", "first_name", "last_name", "contact", "membership_type", "total_monthly_fee"],
+     monthly_fee_rows),
+    ("payroll", ["instructor_id", "name", "classes", "registrations", "revenue"], payroll_rows),
+]
+
+
+class ReportSink: #somewhere report rows go; subclasses override what they need
+    def start_section(self, section: str, fields: List[str]):
+        pass
+
+    def write_row(self, section: str, row: dict):
+        raise NotImplementedError
+
+    def end_section(self, section: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink(ReportSink): #the same text generate_reports has always printed
+    HEADERS = {
+        "members": "\n[+]List of all members and the total num of members:",
+        "sessions": "\n[+]List of all classes and their schedule:",
+        "memberships": "\n[+]List of members for each membership type and total fees:",
+        "class_earnings": "\n[+]List of members registered for classes && total earnings:",
+        "monthly_fees": "\n[+]Report for each client with total monthly fee:",
+        "payroll": "\n[+]Classes taught, registrations and revenue for each instructor:",
+    }
+
+    def __init__(self):
+        self.rows = 0
+
+    def start_section(self, section, fields):
+        self.rows = 0
+        print(self.HEADERS[section])
+
+    def write_row(self, section, row):
+        self.rows += 1
+        if section == "members":
+            print(f"[+]{row['member_id']}: {row['first_name']} {row['last_name']} ({row['membership_type']})")
+        elif section == "sessions":
+            print(f"[+]{row['session_id']}: {row['name']} - ${row['cost']} ({row['schedule']})")
+        elif section == "memberships":
+            print(f"[+]{row['membership_type']}: {row['members']} members, Total fees: ${row['total_fees']}")
+        elif section == "class_earnings":
+            print(f"[+]{row['session_id']}: Total earnings: ${row['total_earnings']}")
+        elif section == "monthly_fees":
+            print(f"[+]{row['member_id']}: {row['first_name']} {row['last_name']}, Contact: {row['contact']}, "
+                  f"Membership Type: {row['membership_type']}, Total monthly fee: ${row['total_monthly_fee']}")
+        elif section == "payroll":
+            print(f"[+]{row['instructor_id'] or '-'}: {row['name']}, Classes: {row['classes']}, "
+                  f"Registrations: {row['registrations']}, Revenue: ${row['revenue']}")
+
+    def end_section(self, section):
+        if section == "members":
+            print(f"\nTotal number of members: {self.rows}")
+
+
+class CsvSink(ReportSink): #one csv file per section in the given directory
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.file = None
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start_section(self, section, fields):
+        # the header goes in straight away, so a section with no rows is still a valid csv
+        self.file = open(os.path.join(self.directory, f"{section}.csv"), "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write_row(self, section, row):
+        self.writer.writerow(row)
+
+    def end_section(self, section):
+        self.file.close()
+        self.file = None
+        self.writer = None
+
+
+class JsonLinesSink(ReportSink): #every row as one json object tagged with its section, e.g. for piping to stdout
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write_row(self, section, row):
+        self.stream.write(json.dumps({"section": section, **row}) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+def write_report(gym, sinks: List[ReportSink], period: str):
+    metrics = gym.metrics
+    for section, fields, rows in SECTIONS:
+        start = time.perf_counter()
+        count = 0
+        for sink in sinks:
+            sink.start_section(section, fields)
+        for row in rows(gym, period):
+            count += 1
+            for sink in sinks:
+                sink.write_row(section, row)
+        for sink in sinks:
+            sink.end_section(section)
+        if metrics.enabled:  # monthly_fees is the per-member billing loop
+            metrics.observe(f"report_{section}", time.perf_counter() - start, count)
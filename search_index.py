@@ -0,0 +1,81 @@
+from typing import List, Optional
+
+# Member lookups for the front desk and the menu header, kept up to date as members are stored.
+
+
+class PrefixTrie: #type-ahead over strings, each key points at the member ids stored under it
+    def __init__(self):
+        self.root = {}  # char -> child node; the "" key holds the ids that end at that node
+
+    def insert(self, key: str, member_id: str):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault("", []).append(member_id)
+
+    def search(self, prefix: str, limit: int = 10) -> List[str]:
+        if limit <= 0:
+            return []
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        # walk the subtree depth first, shortest keys first, and stop once there are enough
+        found = []
+        seen = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for member_id in node.get("", ()):
+                if member_id not in seen:
+                    seen.add(member_id)
+                    found.append(member_id)
+                    if len(found) == limit:
+                        return found
+            stack.extend(node[char] for char in sorted(node, reverse=True) if char)
+        return found
+
+
+class MemberSearchIndex:
+    def __init__(self):
+        self.by_first_name = {}  # casefolded first name -> member ids, oldest first
+        self.names = PrefixTrie()  # first, last and full names
+        self.contacts = PrefixTrie()  # phone numbers with the punctuation stripped
+        self.ids = PrefixTrie()
+        self.users = {}  # username -> member id, for logins tied to a member explicitly
+
+    def add(self, member):
+        first = member.first_name.casefold()
+        last = member.last_name.casefold()
+        full = f"{first} {last}".strip()
+        self.by_first_name.setdefault(first, []).append(member.member_id)
+        for name in {first, last, full}:
+            if name:
+                self.names.insert(name, member.member_id)
+        digits = "".join(char for char in member.contact if char.isdigit())
+        if digits:
+            self.contacts.insert(digits, member.member_id)
+        self.ids.insert(member.member_id, member.member_id)
+
+    def link_user(self, username: str, member_id: str):
+        self.users[username.casefold()] = member_id
+
+    def member_for_user(self, username: str) -> Optional[str]:
+        # an explicit link wins; otherwise the first member whose first name is the username, as the menu always did
+        key = username.casefold()
+        if key in self.users:
+            return self.users[key]
+        members = self.by_first_name.get(key)
+        return members[0] if members else None
+
+    def search(self, query: str, limit: int = 10) -> List[str]: #member ids matching an id, name or phone prefix
+        query = query.strip()
+        if not query:
+            return []
+        if query[0] in "Mm" and query[1:].isdigit():
+            return self.ids.search(query.upper(), limit)
+        digits = "".join(char for char in query if char.isdigit())
+        if digits and len(digits) == len(query.replace("-", "").replace(" ", "").replace("+", "")):
+            return self.contacts.search(digits, limit)
+        return self.names.search(query.casefold(), limit)
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from gym_oop import MEMBER_ID_PATTERN, GymOnTheRock
+from metrics import Metrics
+from storage import StorageInUse, open_storage
+
+# Front-desk service for kiosks and the mobile app.
+# One JSON object per line in each direction over TCP or a unix socket:
+#   {"op": "checkin", "member_id": "M0007"}           -> {"ok": true, "checkin": 12, "first_name": ...}
+#   {"op": "register", "checkin": 12, "session_id": "S01"} -> {"ok": true, "session": "MA Classes"}
+#   {"op": "member", "member_id": "M0007"}            -> {"ok": true, "member": {...}, "bill": {...}}
+#   {"op": "search", "query": "ann", "limit": 10}     -> {"ok": true, "members": [...]}  (limit 1-50)
+#   {"op": "sessions"}                                -> {"ok": true, "sessions": [...]}
+# Failures come back as {"ok": false, "error": "1006", "message": ...} with the usual error codes.
+# Every change (and every bill lookup) runs on one writer thread, so changes are applied and
+# saved one at a time in arrival order while the event loop keeps answering other kiosks.
+
+
+MAX_SEARCH_RESULTS = 50
+
+
+def _error(code: str, message: str) -> dict:
+    return {"ok": False, "error": code, "message": message}
+
+
+def _whole_number(value) -> bool: #json true/false come through as bools, which python counts as ints
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class FrontDeskService:
+    def __init__(self, gym: GymOnTheRock):
+        self.gym = gym
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frontdesk-writer")
+        # the writer-thread work is what kiosks wait on, so that's what gets timed when metrics are on
+        self._check_in = gym.metrics.wrap("service_checkin", self._check_in)
+        self._register = gym.metrics.wrap("service_register", self._register)
+        self._member = gym.metrics.wrap("service_member", self._member)
+
+    async def _write(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.writer, fn, *args)
+
+    def _check_in(self, member_id: str) -> dict:
+        checkin = self.gym._record_checkin(member_id, datetime.now())
+        return {"ok": True, "checkin": checkin.index, "first_name": self.gym.members[member_id].first_name}
+
+    def _register(self, index: int, session_id: str) -> dict:
+        self.gym.check_ins[index].add_session(session_id)
+        return {"ok": True, "session": self.gym.sessions[session_id].name}
+
+    async def check_in(self, request: dict) -> dict:
+        member_id = str(request.get("member_id", "")).strip().upper()
+        if not MEMBER_ID_PATTERN.match(member_id):
+            return _error("2020", "ID must be M and 4 or more digits eg. M0007")
+        if member_id not in self.gym.members:
+            return _error("1006", "Enter valid member ID")
+        return await self._write(self._check_in, member_id)
+
+    async def register(self, request: dict) -> dict:
+        session_id = str(request.get("session_id", "")).strip().upper()
+        index = request.get("checkin")
+        if not _whole_number(index) or not 0 <= index < len(self.gym.check_ins):
+            return _error("1006", "Enter valid check-in")
+        if session_id not in self.gym.sessions:
+            return _error("1010", "Invalid session ID")
+        return await self._write(self._register, index, session_id)
+
+    def _member(self, member_id: str) -> dict:
+        member = self.gym.members[member_id]
+        return {"ok": True,
+                "member": {"member_id": member_id, "first_name": member.first_name, "last_name": member.last_name,
+                           "contact": member.contact, "membership_type": member.membership_type},
+                "bill": self.gym.get_member_bill(member_id)}
+
+    async def member(self, request: dict) -> dict:
+        member_id = str(request.get("member_id", "")).strip().upper()
+        if member_id not in self.gym.members:
+            return _error("1006", "Enter valid member ID")
+        # the bill is read on the writer thread too, so it never sees a registration half-applied
+        return await self._write(self._member, member_id)
+
+    async def search(self, request: dict) -> dict:
+        # type-ahead for the front desk: id, name or phone prefix
+        limit = request.get("limit", 10)
+        if not _whole_number(limit):
+            return _error("2003", "limit must be a whole number")
+        limit = min(max(limit, 1), MAX_SEARCH_RESULTS)
+        members = self.gym.find_members(str(request.get("query", "")), limit)
+        return {"ok": True, "members": [{"member_id": m.member_id, "first_name": m.first_name,
+                                         "last_name": m.last_name, "contact": m.contact} for m in members]}
+
+    async def sessions(self, request: dict) -> dict:
+        return {"ok": True, "sessions": [{"session_id": sid, "name": s.name, "cost": s.cost, "schedule": s.schedule}
+                                         for sid, s in self.gym.sessions.items()]}
+
+    async def handle(self, request: dict) -> dict:
+        if not isinstance(request, dict):
+            return _error("2003", "request must be one JSON object per line")
+        handler = {"checkin": self.check_in, "register": self.register,
+                   "member": self.member, "search": self.search, "sessions": self.sessions}.get(request.get("op"))
+        if handler is None:
+            return _error("2003", "Enter a valid option")
+        return await handler(request)
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = _error("2003", "request must be one JSON object per line")
+                else:
+                    try:
+                        response = await self.handle(request)
+                    except (TypeError, ValueError, OverflowError):  # a field of the wrong type or size
+                        response = _error("2003", "invalid value in request")
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None) -> asyncio.AbstractServer:
+        if path:
+            return await asyncio.start_unix_server(self.serve_client, path=path)
+        return await asyncio.start_server(self.serve_client, host, port)
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+
+
+async def serve(service: FrontDeskService, host: str, port: int, path: Optional[str]):
+    server = await service.start(host, port, path)
+    print(f"[+]Front desk service listening on {path or f'{host}:{port}'}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gym-On-The-Rock front desk service")
+    parser.add_argument("--data", default="gym_data", help="storage location (a directory, or a .db file for sqlite)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this unix socket path instead of tcp")
+    args = parser.parse_args()
+
+    try:
+        storage = open_storage(args.data)
+    except StorageInUse as error:
+        sys.exit(str(error))
+    gym = GymOnTheRock(storage, Metrics.from_env())
+    service = FrontDeskService(gym)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\n[+]Have a nice day:)")
+    finally:
+        service.close()
+        gym.close()
+
+
+if __name__ == "__main__":
+    main()
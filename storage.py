@@ -0,0 +1,412 @@
+import json
+import os
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import fcntl  # posix only; without it nothing stops two processes sharing the files
+except ImportError:
+    fcntl = None
+
+# A storage backend keeps GymOnTheRock state across restarts.
+# State is a plain dict (see GymOnTheRock.export_state) and every change is an event:
+#   ("user", {...}), ("member", {...}), ("session", {...}), ("instructor", {...}),
+#   ("user_member", {"username", "member_id"}),
+#   ("assignment", {"session_id", "instructor_id", "effective"}), ("ids", {"name", "limit", "next" on a clean close}),
+#   ("checkin", {"checkin", "member_id", "timestamp"}), ("checkin_session", {"checkin", "session_id"})
+# where "checkin" is the check-in's position in gym.check_ins
+# load() returns the newest state plus the events recorded after it.
+# append_batch() writes several events so that either all of them survive a crash or none do.
+# Only one process may write a location at a time: opening it takes an exclusive lock file, held until
+# close(). read_only=True opens without the lock, e.g. to bill a branch while it is still trading.
+
+
+class StorageInUse(Exception):
+    def __init__(self, location: str):
+        super().__init__(f"[+]Error 2030: {location} is in use by another process")
+
+
+def _lock(path: str, location: str):
+    # an exclusive flock on path, released when the returned file is closed (or the process dies)
+    lock_file = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise StorageInUse(location) from None
+    return lock_file
+
+
+class Storage:
+    def load(self) -> Tuple[Optional[dict], List[Tuple[str, dict]]]:
+        raise NotImplementedError
+
+    def append(self, kind: str, record: dict):
+        raise NotImplementedError
+
+    def append_batch(self, events: List[Tuple[str, dict]]):
+        raise NotImplementedError
+
+    def needs_snapshot(self) -> bool:
+        return False
+
+    def snapshot(self, state: dict):
+        pass
+
+    def compact(self, export_state: Callable[[], dict]):
+        # called when needs_snapshot() says so; backends that can't write a snapshot in the background do it here
+        self.snapshot(export_state())
+
+    def close(self):
+        pass
+
+
+class WALStorage(Storage): #append-only log of changes plus a compact snapshot every so often
+    # The log is wal.log. Compaction renames it to wal-<seq>.log, where seq is its last event, and
+    # starts a new wal.log; a forked copy of the process writes the snapshot from memory as it was at
+    # that moment while this one carries on, and the old segment is deleted once the snapshot is in.
+    def __init__(self, directory: str, snapshot_every: int = 10000, read_only: bool = False):
+        self.directory = directory
+        self.read_only = read_only
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "wal.log")
+        self.seq = 0  # sequence number of the last event written
+        self.since_snapshot = 0
+        self.log = None
+        self.compactor = None  # (pid, last seq, events) of the segment a forked child is writing a snapshot for
+        self.lock_file = None
+        if read_only and not os.path.isdir(directory):
+            raise FileNotFoundError(f"no data in {directory}")
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+            self.lock_file = _lock(os.path.join(directory, "lock"), directory)
+
+    def _segments(self) -> List[Tuple[int, str]]: #(last seq, path) of the logs waiting on a snapshot, oldest first
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log") and name[4:-4].isdigit():
+                segments.append((int(name[4:-4]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _drop_segments(self, upto: int):
+        for seq, path in self._segments():
+            if seq <= upto:
+                os.remove(path)
+
+    def load(self):
+        if self.read_only:
+            while True:
+                try:
+                    return self._read()
+                except FileNotFoundError:
+                    pass  # the writer finished a compaction and deleted a segment under us; read the new snapshot
+        return self._read()
+
+    def _read(self):
+        state = None
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            state = saved["state"]
+            snapshot_seq = saved["seq"]
+        # segments left behind by a compaction that finished just before a crash are already in the snapshot
+        if not self.read_only:
+            self._drop_segments(snapshot_seq)
+
+        # only what was written after the snapshot is replayed
+        events = []
+        self.seq = snapshot_seq
+        segments = self._segments()
+        for _, path in segments + [(None, self.log_path)]:
+            if not os.path.exists(path):
+                continue
+            good = 0  # bytes of whole, readable lines at the start of the log
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("line cut short")
+                        seq, kind, record = json.loads(line)
+                    except ValueError:
+                        break  # torn write from a crash, everything after it is lost
+                    good += len(line)
+                    if seq > snapshot_seq:
+                        if kind == "batch":
+                            events.extend((k, r) for k, r in record)
+                        else:
+                            events.append((kind, record))
+                        self.seq = seq
+            # the torn tail is cut off, otherwise new events would be appended behind it and skipped next time;
+            # a reader leaves it, it may be a write still under way
+            if good < os.path.getsize(path) and not self.read_only:
+                with open(path, "r+b") as f:
+                    f.truncate(good)
+                    f.flush()
+                    os.fsync(f.fileno())
+        if self.read_only:
+            if self._segments() != segments:
+                raise FileNotFoundError(self.log_path)  # wal.log became a segment while we read it, start over
+            return state, events
+        self.since_snapshot = len(events)
+        self.log = open(self.log_path, "a", encoding="utf-8")
+        return state, events
+
+    def append(self, kind, record):
+        if self.read_only:
+            raise ValueError(f"{self.directory} is opened read-only")
+        if self.compactor is not None:
+            self._reap()
+        self.seq += 1
+        self.since_snapshot += 1
+        self.log.write(json.dumps([self.seq, kind, record], separators=(",", ":")) + "\n")
+        self.log.flush()
+        os.fsync(self.log.fileno())
+
+    def append_batch(self, events):
+        # the whole batch is one log line, a torn write drops all of it
+        self.append("batch", [[kind, record] for kind, record in events])
+        self.since_snapshot += len(events) - 1
+
+    def needs_snapshot(self):
+        return self.since_snapshot >= self.snapshot_every and self.compactor is None
+
+    def compact(self, export_state):
+        if not hasattr(os, "fork"):
+            return self.snapshot(export_state())
+        # the log so far becomes a segment of its own and new events go to a fresh wal.log
+        self.log.close()
+        os.replace(self.log_path, os.path.join(self.directory, f"wal-{self.seq:012d}.log"))
+        self.log = open(self.log_path, "a", encoding="utf-8")
+        pid = os.fork()
+        if pid == 0:
+            # the child has memory exactly as it was at the rename; it writes the snapshot and leaves
+            # without running any of the parent's exit handlers
+            status = 1
+            try:
+                self._write_snapshot(export_state())
+                status = 0
+            finally:
+                os._exit(status)
+        self.compactor = (pid, self.seq, self.since_snapshot)
+        self.since_snapshot = 0
+
+    def _reap(self, wait: bool = False):
+        pid, seq, events = self.compactor
+        done, status = os.waitpid(pid, 0 if wait else os.WNOHANG)
+        if not done:
+            return
+        self.compactor = None
+        if os.waitstatus_to_exitcode(status) == 0:
+            self._drop_segments(seq)
+        else:
+            self.since_snapshot += events  # the segments stay and are replayed; the next append tries again
+
+    def _write_snapshot(self, state):
+        # write the snapshot beside the old one and swap it in
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "state": state}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def snapshot(self, state):
+        # written in place, e.g. on close: a compaction still under way finishes first
+        if self.read_only:
+            return
+        if self.compactor is not None:
+            self._reap(wait=True)
+        self._write_snapshot(state)
+        # a crash before the truncate is harmless, load() skips events already in the snapshot
+        self._drop_segments(self.seq)
+        self.log.close()
+        self.log = open(self.log_path, "w", encoding="utf-8")
+        self.since_snapshot = 0
+
+    def close(self):
+        if self.compactor is not None:
+            self._reap(wait=True)
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+class SQLiteStorage(Storage): #every change goes straight into indexed tables
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password_hash TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS user_members (username TEXT PRIMARY KEY, member_id TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS members (
+            member_id TEXT PRIMARY KEY, first_name TEXT, last_name TEXT,
+            contact TEXT, membership_type TEXT, date TEXT);
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY, name TEXT, cost INTEGER, schedule TEXT);
+        CREATE TABLE IF NOT EXISTS instructors (
+            instructor_id TEXT PRIMARY KEY, first_name TEXT, last_name TEXT);
+        CREATE TABLE IF NOT EXISTS check_ins (
+            checkin_id INTEGER PRIMARY KEY, member_id TEXT NOT NULL, timestamp REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS session_prices (
+            session_id TEXT NOT NULL, effective REAL NOT NULL, cost INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS session_instructors (session_id TEXT PRIMARY KEY, instructor_id TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS instructor_assignments (
+            session_id TEXT NOT NULL, effective REAL NOT NULL, instructor_id TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS id_limits (name TEXT PRIMARY KEY, id_limit INTEGER NOT NULL, next_id INTEGER);
+        CREATE TABLE IF NOT EXISTS checkin_sessions (
+            checkin_id INTEGER NOT NULL, session_id TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS month_totals (name TEXT PRIMARY KEY, totals TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_check_ins_member ON check_ins (member_id);
+        CREATE INDEX IF NOT EXISTS idx_check_ins_time ON check_ins (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_checkin_sessions_checkin ON checkin_sessions (checkin_id);
+        CREATE INDEX IF NOT EXISTS idx_checkin_sessions_session ON checkin_sessions (session_id);
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self.lock_file = None
+        if read_only:
+            # sqlite's own locking lets this read beside the writer; mode=ro fails if there is no database yet
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.lock_file = _lock(path + ".lock", path)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        if "next_id" not in [row[1] for row in self.db.execute("PRAGMA table_info(id_limits)")]:
+            self.db.execute("ALTER TABLE id_limits ADD COLUMN next_id INTEGER")  # made before close() saved it
+
+    def load(self):
+        db = self.db
+        if db.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            return None, []
+
+        # check-ins are numbered from 0 in insert order, the same position they have in gym.check_ins
+        check_ins = {"member_id": [], "timestamp": []}
+        for member_id, timestamp in db.execute("SELECT member_id, timestamp FROM check_ins ORDER BY checkin_id"):
+            check_ins["member_id"].append(member_id)
+            check_ins["timestamp"].append(timestamp)
+        registrations = {"checkin": [], "session_id": []}
+        for checkin_id, session_id in db.execute("SELECT checkin_id, session_id FROM checkin_sessions ORDER BY rowid"):
+            registrations["checkin"].append(checkin_id)
+            registrations["session_id"].append(session_id)
+
+        prices = {}
+        for session_id, effective, cost in db.execute("SELECT session_id, effective, cost FROM session_prices ORDER BY rowid"):
+            prices.setdefault(session_id, []).append([effective, cost])
+
+        # every assignment with the time it took effect; sessions assigned before the history was kept
+        # come first, as taught all along
+        assignments = [list(row) for row in db.execute(
+            "SELECT session_id, effective, instructor_id FROM instructor_assignments ORDER BY rowid")]
+        dated = {row[0] for row in assignments}
+        assignments[:0] = [list(row) for row in db.execute(
+            "SELECT session_id, instructor_id FROM session_instructors ORDER BY rowid") if row[0] not in dated]
+
+        state = {
+            "users": [list(row) for row in db.execute("SELECT username, password_hash FROM users")],
+            "user_members": [list(row) for row in db.execute("SELECT username, member_id FROM user_members")],
+            "members": [list(row) for row in db.execute(
+                "SELECT member_id, first_name, last_name, contact, membership_type, date FROM members ORDER BY rowid")],
+            "sessions": [list(row) for row in db.execute(
+                "SELECT session_id, name, cost, schedule FROM sessions ORDER BY rowid")],
+            "instructors": [list(row) for row in db.execute(
+                "SELECT instructor_id, first_name, last_name FROM instructors ORDER BY rowid")],
+            "assignments": assignments,
+            "prices": prices,
+            "ids": {name: [limit, next_id]
+                    for name, limit, next_id in db.execute("SELECT name, id_limit, next_id FROM id_limits")},
+            "check_ins": check_ins,
+            "registrations": registrations,
+        }
+        # the month totals saved by the last snapshot, as long as no check-in came in after it
+        saved = db.execute("SELECT totals FROM month_totals WHERE name = 'months'").fetchone()
+        if saved is not None:
+            saved = json.loads(saved[0])
+            if saved["rows"] == [len(check_ins["member_id"]), len(registrations["checkin"])]:
+                state.update((name, saved[name]) for name in ("bills", "session_totals", "instructor_totals")
+                             if name in saved)
+        return state, []
+
+    def append(self, kind, record):
+        if self.read_only:
+            raise ValueError(f"{self.path} is opened read-only")
+        self._write(kind, record)
+        self.db.commit()
+
+    def append_batch(self, events):
+        if self.read_only:
+            raise ValueError(f"{self.path} is opened read-only")
+        with self.db:  # one transaction, rolled back if any write fails
+            for kind, record in events:
+                self._write(kind, record)
+
+    def _write(self, kind, record):
+        db = self.db
+        if kind == "user":
+            db.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (record["username"], record["password_hash"]))
+        elif kind == "member":
+            db.execute("INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?)",
+                       (record["member_id"], record["first_name"], record["last_name"],
+                        record["contact"], record["membership_type"], record["date"]))
+        elif kind == "session":
+            # an update keeps the row (and its rowid) so sessions load back in their original order
+            db.execute("INSERT INTO sessions VALUES (?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+                       "name = excluded.name, cost = excluded.cost, schedule = excluded.schedule",
+                       (record["session_id"], record["name"], record["cost"], record["schedule"]))
+            # every save is kept; the gym drops the ones that didn't change the price when it loads them
+            db.execute("INSERT INTO session_prices VALUES (?, ?, ?)",
+                       (record["session_id"], record.get("effective", 0.0), record["cost"]))
+        elif kind == "instructor":
+            db.execute("INSERT OR REPLACE INTO instructors VALUES (?, ?, ?)",
+                       (record["instructor_id"], record["first_name"], record["last_name"]))
+        elif kind == "checkin":
+            db.execute("INSERT INTO check_ins VALUES (?, ?, ?)",
+                       (record["checkin"], record["member_id"], record["timestamp"]))
+        elif kind == "checkin_session":
+            db.execute("INSERT INTO checkin_sessions VALUES (?, ?)", (record["checkin"], record["session_id"]))
+        elif kind == "assignment":
+            db.execute("INSERT OR REPLACE INTO session_instructors VALUES (?, ?)",
+                       (record["session_id"], record["instructor_id"]))
+            db.execute("INSERT INTO instructor_assignments VALUES (?, ?, ?)",
+                       (record["session_id"], record.get("effective", 0.0), record["instructor_id"]))
+        elif kind == "user_member":
+            db.execute("INSERT OR REPLACE INTO user_members VALUES (?, ?)", (record["username"], record["member_id"]))
+        elif kind == "ids":
+            # next_id is only there after a clean close; a limit saved while running clears it
+            db.execute("INSERT OR REPLACE INTO id_limits VALUES (?, ?, ?)",
+                       (record["name"], record["limit"], record.get("next")))
+        else:
+            raise ValueError(f"unknown event kind {kind!r}")
+
+    def snapshot(self, state):
+        # the tables are the state already; only the month totals are kept, so the next start needn't rebuild them
+        if self.read_only:
+            return
+        totals = {"rows": [len(state["check_ins"]["member_id"]), len(state["registrations"]["checkin"])],
+                  "bills": state["bills"], "session_totals": state["session_totals"],
+                  "instructor_totals": state["instructor_totals"]}
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO month_totals VALUES ('months', ?)",
+                            (json.dumps(totals, separators=(",", ":")),))
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.db.close()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+def open_storage(location: str, read_only: bool = False) -> Storage: #picks the backend from the path, *.db / *.sqlite is sqlite, anything else a log directory
+    if location.endswith(".gymcol"):
+        from columnar import ColumnarSnapshot  # a read-only month exported by columnar.export_columnar
+        return ColumnarSnapshot(location)
+    if location.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteStorage(location, read_only)
+    return WALStorage(location, read_only=read_only)
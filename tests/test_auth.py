@@ -0,0 +1,59 @@
+import time
+from datetime import timedelta
+
+from gym_oop import GymOnTheRock, LockoutTable, hash_password, verify_password
+
+
+def test_passwords_are_salted_and_verified():
+    first, second = hash_password("Secret#1"), hash_password("Secret#1")
+    assert first != second and first.startswith("scrypt$") and "Secret#1" not in first
+    assert verify_password("Secret#1", first) and verify_password("Secret#1", second)
+    assert not verify_password("Secret#2", first)
+
+
+def test_credentials_are_checked_on_the_pool():
+    gym = GymOnTheRock()  # sample user: username / username123
+    assert gym.check_credentials("username", "username123").result() is True
+    assert gym.check_credentials("username", "wrong").result() is False
+    assert gym.check_credentials("nobody", "username123").result() is False
+
+
+def test_three_failures_lock_the_account():
+    table = LockoutTable()
+    assert [table.record_failure("ann") for _ in range(3)] == [1, 2, 3]
+    assert table.locked_for("ann") > timedelta(minutes=4)
+    table.record_success("ann")
+    assert table.locked_for("ann") is None
+
+
+def test_entries_expire_on_their_own():
+    table = LockoutTable(lockout_duration=timedelta(milliseconds=50))
+    for _ in range(3):
+        table.record_failure("ann")
+    table.record_failure("bob")
+    assert table.locked_for("ann") is not None
+    time.sleep(0.1)
+    assert table.locked_for("ann") is None
+    assert not table.entries and not table.locked
+    assert table.record_failure("bob") == 1
+
+
+def test_a_flood_of_failures_cannot_push_out_a_lockout():
+    table = LockoutTable(max_entries=100)
+    for _ in range(3):
+        table.record_failure("victim")
+    for n in range(100):
+        table.record_failure(f"junk{n}")
+    assert table.locked_for("victim") is not None
+    assert len(table.entries) + len(table.locked) == 100
+    assert "junk0" not in table.entries and "junk99" in table.entries  # the oldest counts made room
+
+
+def test_a_table_full_of_lockouts_takes_no_new_entries():
+    table = LockoutTable(max_entries=2)
+    for name in ("ann", "bob"):
+        for _ in range(3):
+            table.record_failure(name)
+    assert table.record_failure("cy") == 1
+    assert "cy" not in table.entries and "cy" not in table.locked
+    assert table.locked_for("ann") is not None and table.locked_for("bob") is not None
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+
+from checkin_store import CheckInStore
+from gym_oop import GymOnTheRock, Member, Session
+from storage import WALStorage
+
+
+def _gym_with_three_months(path):
+    gym = GymOnTheRock(WALStorage(str(path)))
+    gym._store_session(Session("S03", "Yoga", 700, "Morning"))
+    for n in range(1, 4):
+        gym._store_member(Member(f"M{n:04d}", "Ann", "Lee", "876-555-0101", "Gold", "2026-01-01"))
+    # interleaved months, the way an import of old door logs arrives
+    for day, month in [(3, 7), (4, 8), (5, 7), (6, 9), (7, 8), (8, 7)]:
+        for n in range(1, 4):
+            checkin = gym._record_checkin(f"M{n:04d}", datetime(2026, month, day, 9))
+            checkin.add_session("S03")
+            checkin.add_session("S01")
+    return gym
+
+
+def test_archived_month_stays_on_disk(tmp_path):
+    gym = _gym_with_three_months(tmp_path / "data")
+    before = [(c.member_id, c.timestamp, c.sessions) for c in gym.check_ins]
+    bill = gym.get_member_bill("M0001", "2026-07")
+    gym.archive_period("2026-07", str(tmp_path / "archive"))
+
+    assert gym.check_ins.member_sessions("M0001", archived=False) == ["S03", "S01"] * 3
+    assert len(gym.check_ins.member_sessions("M0001")) == 12
+    assert [(c.member_id, c.timestamp, c.sessions) for c in gym.check_ins] == before
+    assert "2026-07" in gym.check_ins.archived and "2026-07" not in gym.check_ins.partitions
+    gym.close()
+
+    with open(tmp_path / "data" / "snapshot.json", encoding="utf-8") as f:
+        state = json.load(f)["state"]
+    assert len(state["check_ins"]["member_id"]) == 9  # the archived month's 9 rows stay out of it
+    assert state["archived"][0]["runs"] == [[0, 3], [6, 3], [15, 3]]
+
+    gym = GymOnTheRock(WALStorage(str(tmp_path / "data")))
+    assert "2026-07" in gym.check_ins.archived and "2026-07" not in gym.check_ins.partitions
+    assert gym.get_member_bill("M0001", "2026-07") == bill
+    assert [(c.member_id, c.timestamp, c.sessions) for c in gym.check_ins] == before
+    assert len(gym.check_ins.in_period("2026-07")) == 9
+    assert "2026-07" not in gym.check_ins.partitions  # reads only peek
+    checkin = gym._record_checkin("M0002", datetime(2026, 9, 10, 9))
+    assert checkin.index == len(before)
+    gym.check_ins[0].add_session("S03")  # a change to an archived month brings it back
+    assert "2026-07" in gym.check_ins.partitions
+    gym.close()
+
+
+def test_out_of_order_rows_are_sorted_once_on_the_next_query():
+    store = CheckInStore()
+    for day in (9, 3, 7, 1, 5):
+        store.append("M0001", datetime(2026, 10, day, 9))
+    assert store.time_order is None  # appends only mark it stale
+    start, end = datetime(2026, 10, 2).timestamp(), datetime(2026, 10, 8).timestamp()
+    assert [store.timestamp_of(row) for row in store.rows_between(start, end)] == [
+        datetime(2026, 10, day, 9).timestamp() for day in (3, 5, 7)]
+    store.append("M0001", datetime(2026, 10, 4, 9))
+    assert store.time_order is None
+    assert len(store.rows_between(start, end)) == 4
+
+
+def test_member_sessions_kept_up_to_date_after_the_first_call():
+    store = CheckInStore()
+    store.extend(["M0001", "M0002", "M0001"], [1.0, 2.0, 3.0], [0, 1, 2, 0], ["S01", "S02", "S03", "S04"])
+    assert store.member_sessions("M0001") == ["S01", "S03", "S04"]
+    store.append("M0002", datetime.fromtimestamp(4.0)).add_session("S05")
+    store[0].add_session("S06")
+    assert store.member_sessions("M0001") == ["S01", "S03", "S04", "S06"]
+    assert store.member_sessions("M0002") == ["S02", "S05"]
+    assert store.member_sessions("M0404") == []
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from gym_oop import GymOnTheRock, Member, Session
+from storage import open_storage
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_earnings_keep_the_price_of_the_day(tmp_path, location):
+    location = str(tmp_path / location)
+    rise = datetime.now().replace(day=10, hour=12, minute=0, second=0, microsecond=0)  # well inside this month
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Standard", "2026-10-01"))
+    gym._store_session(Session("S03", "Yoga", 500, "Morning"), (rise - timedelta(days=2)).timestamp())
+    gym._record_checkin("M0001", rise - timedelta(days=1)).add_session("S03")
+    gym._store_session(Session("S03", "Yoga", 800, "Morning"), rise.timestamp())
+    gym._record_checkin("M0001", rise + timedelta(hours=1)).add_session("S03")
+    # a door log imported late, from before the rise, pays the old price
+    gym._record_checkin("M0001", rise - timedelta(hours=12)).add_session("S03")
+
+    period = rise.strftime("%Y-%m")
+    for snapshot in (False, True, False):  # live, then from the log (or tables), then from the snapshot
+        assert gym.session_totals(period)["S03"] == [3, 500 + 800 + 500]
+        assert gym.get_member_bill("M0001", period)["session_cost"] == 500 + 800 + 500
+        assert gym.sessions["S03"].cost == 800
+        gym.close(snapshot=snapshot)
+        gym = GymOnTheRock(open_storage(location))
+    gym.close(snapshot=False)
@@ -0,0 +1,53 @@
+import pytest
+
+import cli
+from gym_oop import GymOnTheRock, Member
+from storage import open_storage
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_cli_runs_carry_on_from_the_last_session_id(tmp_path, capsys, location):
+    location = str(tmp_path / location)
+    for _ in range(3):
+        assert cli.main(["--data", location, "add-session", "Yoga", "700", "Morning"]) == 0
+    out = capsys.readouterr().out
+    assert [line.rsplit(" ", 1)[1] for line in out.splitlines()] == ["S03", "S04", "S05"]
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+@pytest.mark.parametrize("snapshot", [False, True])
+def test_member_ids_continue_across_restarts(tmp_path, location, snapshot):
+    location = str(tmp_path / location)
+    issued = []
+    for _ in range(3):
+        gym = GymOnTheRock(open_storage(location))
+        member_id = gym.generate_member_id()
+        gym._store_member(Member(member_id, "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+        issued.append(member_id)
+        gym.close(snapshot=snapshot)
+    assert issued == ["M0001", "M0002", "M0003"]
+
+
+def test_reserved_block_is_not_handed_out_twice_in_one_process(tmp_path):
+    gym = GymOnTheRock(open_storage(str(tmp_path)))
+    block = gym.allocate_member_ids(150)
+    assert gym.generate_member_id() == "M0151"
+    assert len(set(block)) == 150
+    gym.close(snapshot=False)
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+@pytest.mark.parametrize("snapshot", [False, True])
+def test_an_id_handed_out_but_never_stored_is_not_reissued(tmp_path, location, snapshot):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    assert gym.generate_member_id() == "M0001"  # e.g. an add_member that was cancelled
+    gym.close(snapshot=snapshot)
+
+    gym = GymOnTheRock(open_storage(location))
+    assert gym.generate_member_id() == "M0002"
+    gym.storage.close()  # a crash: the exact next number isn't saved this time
+
+    gym = GymOnTheRock(open_storage(location))
+    assert gym.generate_member_id() == "M0102"  # carries on from the block limit, past anything handed out
+    gym.close(snapshot=snapshot)
@@ -0,0 +1,57 @@
+import csv
+
+from gym_oop import GymOnTheRock, Member
+from ingest import ErrorReport, import_checkins, import_members, read_id_map, write_id_map
+from storage import WALStorage
+
+
+def test_malformed_rows_go_to_the_error_report(tmp_path):
+    gym = GymOnTheRock(WALStorage(str(tmp_path / "data")))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    path = tmp_path / "checkins.jsonl"
+    path.write_text("\n".join([
+        '{"member_id": "M0001", "timestamp": "2026-10-01T08:00:00", "sessions": ["S01"]}',
+        '{"member_id": "M0001", "timestamp": "2026-10-01T09:00:00", "sessions": [1]}',
+        '{"member_id": "M0001", "timestamp": ',
+        '[1, 2, 3]',
+        '{"member_id": "M0001", "timestamp": "2026-10-02T08:00:00"}',
+    ]) + "\n", encoding="utf-8")
+
+    errors = ErrorReport(str(tmp_path / "errors.csv"))
+    added = import_checkins(gym, str(path), errors, chunk_size=2, workers=1)
+    errors.close()
+    gym.close(snapshot=False)
+
+    assert added == 2
+    with open(tmp_path / "errors.csv", newline="", encoding="utf-8") as f:
+        rejected = [(int(row["line"]), row["error_code"]) for row in csv.DictReader(f)]
+    assert rejected == [(2, "2022"), (3, "2022"), (4, "2022")]
+
+
+
+def test_checkins_follow_members_to_their_new_ids(tmp_path):
+    data = str(tmp_path / "data")
+    gym = GymOnTheRock(WALStorage(data))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    (tmp_path / "members.csv").write_text("member_id,first_name,last_name,contact,membership_type\n"
+                                          "M0001,Bob,Ray,876-555-0102,Standard\n"
+                                          "M0001,Cy,Ko,876-555-0103,Gold\n"
+                                          "M0002,Di,Lo,876-555-0104,Gold\n", encoding="utf-8")
+    (tmp_path / "checkins.csv").write_text("member_id,timestamp,sessions\n"
+                                           "M0001,2026-10-01T08:00:00,S01\n"
+                                           "M0002,2026-10-01T09:00:00,S02\n", encoding="utf-8")
+    errors = ErrorReport(str(tmp_path / "errors.csv"))
+    id_map = {}
+    assert import_members(gym, str(tmp_path / "members.csv"), errors, workers=1, id_map=id_map) == 2
+    errors.close()
+    assert id_map == {"M0001": "M0002", "M0002": "M0003"}
+    with open(tmp_path / "errors.csv", newline="", encoding="utf-8") as f:
+        assert [(row["line"], row["error_code"]) for row in csv.DictReader(f)] == [("3", "2023")]
+
+    # a later run with only the check-ins translates them through the map written by this one
+    write_id_map(str(tmp_path / "ids.csv"), id_map)
+    id_map = read_id_map(str(tmp_path / "ids.csv"))
+    assert import_checkins(gym, str(tmp_path / "checkins.csv"), ErrorReport(None), workers=1, id_map=id_map) == 2
+    assert [(checkin.member_id, checkin.sessions) for checkin in gym.check_ins] == [("M0002", ["S01"]),
+                                                                                   ("M0003", ["S02"])]
+    gym.close(snapshot=False)
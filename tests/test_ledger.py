@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+
+from gym_oop import GymOnTheRock, Member
+from storage import open_storage
+
+
+def _check_in(gym, member_id, *session_ids):
+    check_in = gym._record_checkin(member_id, datetime.now())
+    for session_id in session_ids:
+        check_in.add_session(session_id)
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_ledger_totals_follow_each_plan(tmp_path, location):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    gym._store_member(Member("M0002", "Bob", "Ray", "876-555-0102", "Standard", "2026-10-01"))
+    gym._store_member(Member("M0003", "Cat", "Fox", "876-555-0103", "Platinum", "2026-10-01"))
+    _check_in(gym, "M0001", "S01", "S02")
+    _check_in(gym, "M0001", "S01")
+    _check_in(gym, "M0002", "S02")
+    _check_in(gym, "M0003", "S01", "S02")
+
+    # Gold: one session included, the other two at 5% off; Standard pays every session in full;
+    # Platinum's four included sessions cover both
+    expected = {"M0001": (3, 900 * .95 + 1100 * .95, 4000 + 900 * .95 + 1100 * .95),
+                "M0002": (1, 900, 2900),
+                "M0003": (2, 0, 10000)}
+    for snapshot in (False, True, False):  # live, then from the log (or tables), then from the snapshot
+        for member_id, (sessions, session_cost, total) in expected.items():
+            bill = gym.get_member_bill(member_id)
+            assert (bill["sessions"], bill["session_cost"], bill["total"]) == (sessions, session_cost, total)
+        assert gym.get_member_bill("M0404") is None
+        gym.close(snapshot=snapshot)
+        gym = GymOnTheRock(open_storage(location))
+    gym.close(snapshot=False)
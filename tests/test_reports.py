@@ -0,0 +1,72 @@
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+from checkin_store import current_period, period_of
+from columnar import export_columnar, load_columnar
+from gym_oop import GymOnTheRock, Instructor, Member
+from reports import SECTIONS, CsvSink, ReportSink
+from storage import open_storage
+
+
+class PayrollSink(ReportSink):
+    def __init__(self):
+        self.rows = {}
+
+    def write_row(self, section, row):
+        if section == "payroll":
+            self.rows[row["name"]] = (row["classes"], row["registrations"], row["revenue"])
+
+
+def _payroll(gym, period):
+    sink = PayrollSink()
+    gym.generate_reports([sink], period)
+    return sink.rows
+
+
+def test_csv_sections_without_rows_still_have_their_header(tmp_path):
+    gym = GymOnTheRock()  # sample data: two sessions, no members and no instructors
+    gym.generate_reports([CsvSink(str(tmp_path))], "2026-10")
+    for section, fields, _ in SECTIONS:
+        with open(tmp_path / f"{section}.csv", newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == fields
+    with open(tmp_path / "members.csv", encoding="utf-8") as f:
+        assert f.read().splitlines() == ["member_id,first_name,last_name,membership_type"]
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_payroll_stays_with_whoever_taught_the_month(tmp_path, location):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Platinum", "2026-01-01"))
+    gym._store_instructor(Instructor("I001", "Ann", "Hill"))
+    gym._store_instructor(Instructor("I002", "Bob", "Stone"))
+    now = datetime.now()
+    last_month = now.replace(day=1) - timedelta(days=10)
+    gym._assign_session("S01", "I001", (last_month - timedelta(days=40)).timestamp())
+    gym._record_checkin("M0001", last_month).add_session("S01")
+    gym._assign_session("S01", "I002")  # takes over from now on
+    gym._record_checkin("M0001", datetime.now()).add_session("S01")
+    before = period_of(last_month.timestamp())
+    expected = {
+        before: {"Ann Hill": (1, 1, 1100), "Bob Stone": (0, 0, 0), "No instructor": (1, 0, 0)},
+        current_period(): {"Ann Hill": (1, 0, 0), "Bob Stone": (1, 1, 1100), "No instructor": (1, 0, 0)},
+    }
+    for period, rows in expected.items():
+        assert _payroll(gym, period) == rows
+    gym.close(snapshot=False)
+
+    for _ in range(2):  # from the log (or tables), then from the snapshot
+        gym = GymOnTheRock(open_storage(location))
+        for period, rows in expected.items():
+            assert _payroll(gym, period) == rows
+        gym.close()
+
+    gym = GymOnTheRock(open_storage(location))
+    export_columnar(gym, str(tmp_path / "month.gymcol"), before)
+    gym.close(snapshot=False)
+    exported = load_columnar(str(tmp_path / "month.gymcol"))
+    assert _payroll(exported, before) == expected[before]
+    exported.close(snapshot=False)
@@ -0,0 +1,39 @@
+import builtins
+
+import pytest
+
+from gym_oop import GymOnTheRock, Member
+from storage import open_storage
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_staff_link_a_login_when_adding_a_member(tmp_path, monkeypatch, location):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    answers = iter(["ann", "Secret#12", "Ann", "Ray", "876-555-0102", "Gold", "Y", "ann"])
+    monkeypatch.setattr(builtins, "input", lambda prompt="": next(answers))
+    assert gym.signup()
+    assert gym.member_index.member_for_user("ann") == "M0001"  # only the first-name match so far
+    gym.add_member()
+    member_id = gym.member_index.member_for_user("ann")
+    assert member_id != "M0001" and gym.members[member_id].last_name == "Ray"
+    gym.close(snapshot=False)
+
+    gym = GymOnTheRock(open_storage(location))
+    assert gym.member_index.member_for_user("ann") == member_id
+    gym.close()
+    gym = GymOnTheRock(open_storage(location))  # and from the snapshot
+    assert gym.member_index.member_for_user("ann") == member_id
+    gym.close(snapshot=False)
+
+
+def test_signup_cant_claim_a_member(tmp_path, monkeypatch):
+    gym = GymOnTheRock(open_storage(str(tmp_path)))
+    gym._store_member(Member("M0002", "Bob", "Ray", "876-555-0102", "Gold", "2026-10-01"))
+    answers = iter(["carl", "Secret#12", "M0002"])
+    monkeypatch.setattr(builtins, "input", lambda prompt="": next(answers))
+    assert gym.signup()
+    assert next(answers) == "M0002"  # never asked for a member id
+    assert gym.member_index.member_for_user("carl") is None
+    gym.close(snapshot=False)
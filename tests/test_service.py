@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+from gym_oop import GymOnTheRock, Member
+from service import FrontDeskService
+from storage import WALStorage
+
+
+def test_bad_requests_get_an_error_and_keep_the_connection(tmp_path):
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    for n in range(1, 61):
+        gym._store_member(Member(f"M{n:04d}", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    service = FrontDeskService(gym)
+
+    async def talk():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        replies = []
+        for request in ('{"op": "search", "query": "ann", "limit": [1]}',
+                        '{"op": "search", "query": "ann", "limit": 1e400}',
+                        '{"op": "search", "query": "ann", "limit": true}',
+                        '{"op": "register", "checkin": true, "session_id": "S01"}',
+                        '{"op": "search", "query": "ann", "limit": 0}',
+                        '{"op": "search", "query": "ann", "limit": 1000}'):
+            writer.write(request.encode() + b"\n")
+            await writer.drain()
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return replies
+
+    *bad, unknown_checkin, smallest, largest = asyncio.run(talk())
+    service.close()
+    gym.close(snapshot=False)
+    assert bad == [{"ok": False, "error": "2003", "message": "limit must be a whole number"}] * 3
+    assert unknown_checkin == {"ok": False, "error": "1006", "message": "Enter valid check-in"}
+    assert len(smallest["members"]) == 1
+    assert len(largest["members"]) == 50
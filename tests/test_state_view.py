@@ -0,0 +1,50 @@
+import threading
+from datetime import datetime
+
+import gym_oop
+from gym_oop import GymOnTheRock, Member
+from storage import WALStorage
+
+
+def test_view_is_not_changed_by_a_writer_already_under_way(tmp_path, monkeypatch):
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Standard", "2026-10-01"))
+    now = datetime.now()
+    gym._record_checkin("M0001", now).add_session("S01")
+    checkin = gym._record_checkin("M0001", now)
+
+    # the writer stops halfway through changing the bill
+    entered, release = threading.Event(), threading.Event()
+    add_session = gym_oop.MemberBill.add_session
+
+    def paused_add_session(bill, session_id, price):
+        entered.set()
+        release.wait(5)
+        add_session(bill, session_id, price)
+
+    monkeypatch.setattr(gym_oop.MemberBill, "add_session", paused_add_session)
+    writer = threading.Thread(target=checkin.add_session, args=("S02",))
+    writer.start()
+    assert entered.wait(5)
+
+    reads = []
+    opened, read_again = threading.Event(), threading.Event()
+
+    def reader():
+        with gym.read_view() as view:
+            reads.append((view.get_member_bill("M0001")["total"], view.session_totals(now.strftime("%Y-%m"))))
+            opened.set()
+            read_again.wait(5)
+            reads.append((view.get_member_bill("M0001")["total"], view.session_totals(now.strftime("%Y-%m"))))
+
+    viewer = threading.Thread(target=reader)
+    viewer.start()
+    opened.wait(0.2)  # with the race, the view opens and reads here while the writer is paused
+    release.set()
+    writer.join(5)
+    read_again.set()
+    viewer.join(5)
+    gym.close(snapshot=False)
+
+    assert len(reads) == 2 and reads[0] == reads[1]
+    assert reads[0][0] == 2000 + 1100 + 900  # the view opened once the registration was done, and has all of it
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+
+import gym_oop
+from checkin_store import current_period
+from gym_oop import GymOnTheRock, Member
+from storage import StorageInUse, WALStorage, open_storage
+
+
+def test_wal_cuts_torn_tail_before_appending(tmp_path):
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    gym.close(snapshot=False)
+    with open(tmp_path / "wal.log", "a", encoding="utf-8") as log:
+        log.write('[99,"member",{"member_id":"M00')  # a crash halfway through a write
+
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    assert "M0001" in gym.members
+    gym._store_member(Member("M0002", "Bob", "Ray", "876-555-0102", "Standard", "2026-10-02"))
+    gym.close(snapshot=False)
+
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    assert {"M0001", "M0002"} <= set(gym.members)
+    gym.close(snapshot=False)
+
+
+def test_wal_drops_line_without_newline(tmp_path):
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    gym.close(snapshot=False)
+    with open(tmp_path / "wal.log", "a", encoding="utf-8") as log:
+        log.write('[50,"member",{"member_id":"M0009","first_name":"X","last_name":"Y","contact":"1",'
+                  '"membership_type":"Gold","date":"2026-10-01"}]')  # whole json, but the newline never made it
+
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    assert "M0009" not in gym.members
+    gym._store_member(Member("M0003", "Cy", "Ko", "876-555-0103", "Gold", "2026-10-03"))
+    gym.close(snapshot=False)
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    assert "M0003" in gym.members
+    gym.close(snapshot=False)
+
+
+def _bills(gym):
+    return [gym.get_member_bill(mid) for mid in gym.members], gym.session_totals(current_period())
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_restart_restores_month_totals_without_replaying_check_ins(tmp_path, monkeypatch, location):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    for _ in range(3):
+        gym._record_checkin("M0001", datetime.now()).add_session("S01")
+    before = _bills(gym)
+    gym.close()
+
+    def replayed(*args):
+        raise AssertionError("check-ins were replayed")
+
+    monkeypatch.setattr(gym_oop.BillingLedger, "record_session", replayed)
+    gym = GymOnTheRock(open_storage(location))
+    assert _bills(gym) == before
+    gym.close(snapshot=False)
+
+
+def test_compaction_runs_in_the_background_and_loses_nothing(tmp_path):
+    gym = GymOnTheRock(WALStorage(str(tmp_path), snapshot_every=20))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    for _ in range(100):
+        gym._record_checkin("M0001", datetime.now()).add_session("S02")
+    before = _bills(gym)
+    gym.close(snapshot=False)
+    assert (tmp_path / "snapshot.json").exists()
+    assert not list(tmp_path.glob("wal-*.log"))  # every finished compaction dropped its segment
+
+    gym = GymOnTheRock(WALStorage(str(tmp_path)))
+    assert _bills(gym) == before
+    gym.close(snapshot=False)
+
+
+@pytest.mark.parametrize("location", ["data", "gym.db"])
+def test_second_writer_is_refused_but_a_reader_gets_in(tmp_path, location):
+    location = str(tmp_path / location)
+    gym = GymOnTheRock(open_storage(location))
+    gym._store_member(Member("M0001", "Ann", "Lee", "876-555-0101", "Gold", "2026-10-01"))
+    with pytest.raises(StorageInUse, match="Error 2030"):
+        open_storage(location)
+
+    reader = GymOnTheRock(open_storage(location, read_only=True))
+    assert "M0001" in reader.members
+    with pytest.raises(ValueError):
+        reader._store_member(Member("M0002", "Bob", "Ray", "876-555-0102", "Gold", "2026-10-01"))
+    reader.close()
+
+    gym.close()
+    gym = GymOnTheRock(open_storage(location))  # the lock went with close()
+    assert set(gym.members) == {"M0001"}
+    gym.close(snapshot=False)